@@ -15,34 +15,263 @@
 #
 #
 # Standard library imports
+import codecs
 import datetime
+import functools
+import hashlib
+import heapq
+import io
+import ipaddress
+import itertools
 import json
+import os
+import re
+import threading
+import time
 
 # Phantom App imports
+# requests, BeautifulSoup, encryption_helper, the vault modules and the file formats of the export are imported by the
+# functions using them, so that every action run doesn't pay for the import of modules it may not need (see
+# benchmarks/import_time.py)
 import phantom.app as phantom
-import requests
-from bs4 import BeautifulSoup
 from phantom.action_result import ActionResult
 from phantom.base_connector import BaseConnector
 
 # Local imports
 from arboraps_consts import *
+from arboraps_utils import (
+    CircuitBreaker,
+    Metrics,
+    NetworkIndex,
+    PackedNetworks,
+    RateLimiter,
+    SharedState,
+    normalize_host,
+    normalize_hosts,
+    parse_host,
+)
+
+
+def _get_host_address(cidr_ip_address):
+    """Function returns the host address used by the APS for the given IP or CIDR: the IP in its canonical form (e.g.
+    compressed IPv6) with the host bits of a CIDR cleared, so that the same host always has the same address. A network
+    of a single IP (/32 or /128) is addressed by the plain IP address.
+
+    :param cidr_ip_address: IP address in format of IP or IP/prefix_size
+    :return: host address
+    """
+
+    return normalize_host(cidr_ip_address) or cidr_ip_address
+
+
+def _push_block_expiry(expiries, host_address, expires_at):
+    """Function sets the expiry time of a blocked host in the document of an expiries file.
+
+    :param expiries: document of the expiries file, {"heap": [[expiry time, host address]], "hosts": {host address: expiry time}}
+    :param host_address: host address of the IP or CIDR
+    :param expires_at: expiry time (seconds since the epoch)
+    :return: None
+    """
+
+    expiries["hosts"][host_address] = expires_at
+    heapq.heappush(expiries["heap"], [expires_at, host_address])
+
+
+def _group_entry_addresses(entry_addresses):
+    """Function groups the addresses of list entries by their host address (see _get_host_address). The APS keeps the
+    address of an entry as it was given when the entry was added, e.g. 2001:0db8::1 or 10.0.0.5/24, so entries are
+    matched with the IPs of an action by their host address, and changed under their own address.
+
+    :param entry_addresses: list of the addresses of list entries
+    :return: dictionary of {host address: list of the addresses of the entries of the host}
+    """
+
+    groups = {}
+    host_addresses, _ = normalize_hosts(entry_addresses)
+    for entry_address, host_address in zip(entry_addresses, host_addresses):
+        groups.setdefault(host_address or entry_address, []).append(entry_address)
+
+    return groups
+
+
+def _update_snapshot_hosts(snapshot, updates):
+    """Function applies successful changes of a list to the entries of a list snapshot.
+
+    :param snapshot: list snapshot with the 'hosts' {host address: update time} of the list, None if there is none
+    :param updates: list of (host address, add, host) tuples, host is the list entry of an added host
+    :return: None
+    """
+
+    if snapshot is None:
+        return
+
+    for host_address, add, host in updates:
+        if add:
+            snapshot["hosts"][host_address] = host.get("updateTime")
+        else:
+            snapshot["hosts"].pop(host_address, None)
+
+
+def _get_changed_hosts(previous_hosts, current_hosts):
+    """Function returns the hosts added, removed or updated between two versions of a poll snapshot.
+
+    :param previous_hosts: dictionary of {host address: update time} of the earlier version
+    :param current_hosts: dictionary of {host address: update time} of the later version
+    :return: set of host addresses
+    """
+
+    return {host_address for host_address, _ in previous_hosts.items() ^ current_hosts.items()}
+
+
+def _get_invalid_entries(invalid):
+    """Function groups the invalid entries of a batch of IPs by value, with the number of each entry of the value in
+    the batch, starting at 1.
+
+    :param invalid: list of the (position, value) of the invalid entries, as returned by normalize_hosts
+    :return: dictionary of {value: comma separated entry numbers}
+    """
+
+    entries = {}
+    for position, value in invalid:
+        entries.setdefault(str(value), []).append(str(position + 1))
+
+    return {value: ", ".join(numbers) for value, numbers in entries.items()}
+
 
+def _iter_json_array(chunks, key):
+    """Function yields the objects of the JSON array stored under the given key of a JSON object, parsing the body chunk
+    by chunk so that the whole response never has to be held in memory.
 
-def _break_ip_address(cidr_ip_address):
-    """Function divides the input parameter into IP address and network mask.
+    :param chunks: iterable of the response body chunks (bytes)
+    :param key: key of the array in the JSON object
+    :return: generator of the array objects, raises ValueError if the key is missing or its value is not an array
+    """
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    marker = f'"{key}"'
+    # The key and the first token of its value
+    key_pattern = re.compile(re.escape(marker) + r"\s*:\s*(\S)")
+    buffer = ""
+    position = None
+
+    def read_chunk():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        return text_decoder.decode(chunk)
+
+    # Find the beginning of the array, the value of the key must be the array itself
+    while position is None:
+        chunk = read_chunk()
+        if chunk is None:
+            raise ValueError(f"No '{key}' array in the JSON response")
+        buffer += chunk
+
+        match = key_pattern.search(buffer)
+        if match is None:
+            # Keep the end of the buffer that may hold the beginning of the key and of its value
+            marker_index = buffer.rfind(marker)
+            if marker_index == -1 or not re.fullmatch(r"\s*(:\s*)?", buffer[marker_index + len(marker) :]):
+                marker_index = len(buffer) - len(marker)
+            buffer = buffer[max(marker_index, 0) :]
+            continue
+
+        if match.group(1) != "[":
+            raise ValueError(f"The '{key}' of the JSON response is not an array")
+        position = match.end()
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position < len(buffer) and buffer[position] == "]":
+            return
+
+        # The array items are objects, an incomplete one fails to decode until the next chunk is read
+        try:
+            if position >= len(buffer):
+                raise ValueError
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = read_chunk()
+            if chunk is None:
+                raise ValueError("Unexpected end of the JSON response")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield item
+
+
+def _add_update_time_iso(host):
+    """Function adds the update time of a list entry in ISO format.
+
+    :param host: list entry as returned by the APS
+    :return: list entry
+    """
+
+    if host.get("updateTime") is not None:
+        date_time = datetime.datetime.utcfromtimestamp(host["updateTime"])
+        host["updatetimeISO"] = date_time.isoformat() + "Z"
+
+    return host
+
+
+def _format_csv_row(values):
+    """Function returns a line of a CSV file.
+
+    :param values: values of the row
+    :return: CSV line
+    """
+
+    import csv
+
+    output = io.StringIO()
+    csv.writer(output).writerow(["" if value is None else value for value in values])
+    return output.getvalue()
 
-    :param cidr_ip_address: IP address in format of IP/prefix_size
-    :return: IP, prefix_size
+
+def _remove_file(file_path):
+    """Function removes a temporary file, if it still exists.
+
+    :param file_path: path of the file
+    :return: None
+    """
+
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def _iter_list_file(file_path):
+    """Function yields the host addresses of a list exported by the export list action. The file is read line by line,
+    it can be NDJSON or CSV (with a hostAddress column), gzip compressed or not.
+
+    :param file_path: path of the file
+    :return: generator of host addresses
     """
 
-    if "/" in cidr_ip_address:
-        ip_address, prefix_size = cidr_ip_address.split("/")
-    else:
-        ip_address = cidr_ip_address
-        prefix_size = 0
+    import csv
+    import gzip
+
+    with open(file_path, "rb") as list_file:
+        compressed = list_file.read(2) == b"\x1f\x8b"
 
-    return ip_address, int(prefix_size)
+    with (gzip.open if compressed else open)(file_path, "rt", encoding="utf-8", newline="") as list_file:
+        first_line = list_file.readline()
+        lines = itertools.chain([first_line], list_file)
+
+        if first_line.lstrip().startswith("{"):
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)["hostAddress"]
+            return
+
+        for row in csv.DictReader(lines):
+            yield row["hostAddress"]
 
 
 class RetVal(tuple):
@@ -50,19 +279,140 @@ class RetVal(tuple):
         return tuple.__new__(RetVal, (val1, val2))
 
 
+class ArborApsSession:
+    """Authenticated HTTP session to the APS appliance, shared by every param of an action run."""
+
+    def __init__(self):
+        self.session = None
+        self.authenticated = False
+        self.from_cache = False
+        self.login_count = 0
+        self.reuse_count = 0
+        # Whether the current param has already logged in or reused the session, so that it is counted once per param
+        self.param_logged_in = False
+        self.pool_size = 1
+        self.timeout = (ARBORAPS_DEFAULT_CONNECT_TIMEOUT, ARBORAPS_DEFAULT_READ_TIMEOUT)
+        # Serializes the re-login of worker threads sharing the session, 'generation' tells them whether another
+        # thread has already logged in again
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def reset(self):
+        """Discard the current HTTP session (if any) and start a new unauthenticated one."""
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.close()
+        self.session = requests.Session()
+
+        # Keep one pooled keep-alive connection per worker thread. Connection errors are retried by urllib3 since the
+        # request never reached the appliance, read errors only for idempotent methods, and HTTP statuses are left to
+        # _make_rest_call which handles the throttling and the session expiry itself
+        retries = Retry(
+            total=ARBORAPS_CONNECTION_MAX_RETRIES,
+            connect=ARBORAPS_CONNECTION_MAX_RETRIES,
+            read=ARBORAPS_CONNECTION_MAX_RETRIES,
+            status=0,
+            redirect=None,
+            backoff_factor=ARBORAPS_CONNECTION_BACKOFF_FACTOR,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.pool_size, 1), max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """Close the underlying HTTP session and its pooled connections."""
+
+        if self.session is not None:
+            self.session.close()
+
+        self.session = None
+        self.authenticated = False
+        self.from_cache = False
+
+
+class ArborApsDevice:
+    """APS appliance of the asset, with its own login session and its own part of the asset state."""
+
+    def __init__(self, server_url, state):
+        self.server_url = server_url
+        self.session = ArborApsSession()
+        self.state = state
+        self.list_indexes = {}
+        self.rate_limiter = None
+        self.circuit_breaker = None
+        self.expiries = None
+        self.poll_snapshots = None
+
+
 class ArborApsConnector(BaseConnector):
     def __init__(self):
         # Call the BaseConnectors init first
         super().__init__()
 
-        self._server_url = None
         self._username = None
         self._password = None
         self._verify_server_cert = True
-        self._session = None
+        self._session_cache_ttl = 0
+        self._list_cache_ttl = 0
+        self._journal_ttl = ARBORAPS_DEFAULT_JOURNAL_TTL
+        self._logout_cached_session = False
+        self._max_concurrent_requests = 1
+        self._connect_timeout = ARBORAPS_DEFAULT_CONNECT_TIMEOUT
+        self._read_timeout = ARBORAPS_DEFAULT_READ_TIMEOUT
+        self._root_state = {}
+        self._state_lock = threading.Lock()
+        # The first device is the one of the 'server_url' asset configuration parameter, the actions fanned out to every
+        # device run each device in its own thread which holds the device in '_local'
+        self._devices = [ArborApsDevice(None, self._root_state)]
+        self._local = threading.local()
+        # Outcome of the params of the single IP actions, reused by the later params of the run for the same host
+        self._param_outcomes = {}
+        self._ingest_list_changes_enabled = False
+        self._include_metrics = False
+        self._metrics_file = None
+        self._max_requests_per_second = 0
+        self._circuit_breaker_threshold = 0
+        self._circuit_breaker_cooldown = ARBORAPS_DEFAULT_CIRCUIT_BREAKER_COOLDOWN
+        self._action_timeout = 0
+        # time.monotonic() after which the list changes of the current param not sent yet are cancelled
+        self._deadline = None
+        # Calls of the current param, merged into the calls of the whole action run once the param is handled
+        self._run_metrics = self._metrics = Metrics()
 
         return
 
+    @property
+    def _device(self):
+        return getattr(self._local, "device", None) or self._devices[0]
+
+    @property
+    def _server_url(self):
+        return self._device.server_url
+
+    @property
+    def _aps_session(self):
+        return self._device.session
+
+    @property
+    def _state(self):
+        return self._device.state
+
+    @property
+    def _list_indexes(self):
+        return self._device.list_indexes
+
+    @property
+    def _expiries(self):
+        return self._device.expiries
+
+    @property
+    def _poll_snapshots(self):
+        return self._device.poll_snapshots
+
     def initialize(self):
         """This is an optional function that can be implemented by the AppConnector derived class. Since the
         configuration dictionary is already validated by the time this function is called, it's a good place to do any
@@ -71,40 +421,364 @@ class ArborApsConnector(BaseConnector):
         called.
         """
 
+        self._run_metrics = self._metrics = Metrics()
+        self._param_outcomes = {}
+
         # get the asset config
         config = self.get_config()
 
         # Access values in asset config by the name
-        self._server_url = config[ARBORAPS_TA_CONFIG_SERVER_URL].strip("/")
+        server_url = config[ARBORAPS_TA_CONFIG_SERVER_URL].strip("/")
         self._username = config[ARBORAPS_TA_CONFIG_USERNAME]
         self._password = config[ARBORAPS_TA_CONFIG_PASSWORD]
         self._verify_server_cert = config.get(ARBORAPS_TA_CONFIG_VERIFY_SSL, True)
+        self._logout_cached_session = config.get(ARBORAPS_TA_CONFIG_LOGOUT_CACHED_SESSION, False)
+        self._ingest_list_changes_enabled = config.get(ARBORAPS_TA_CONFIG_INGEST_LIST_CHANGES, False)
+        self._include_metrics = config.get(ARBORAPS_TA_CONFIG_INCLUDE_METRICS, False)
+        self._metrics_file = config.get(ARBORAPS_TA_CONFIG_METRICS_FILE)
+
+        ret_val, self._session_cache_ttl = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_SESSION_CACHE_TTL, 0), ARBORAPS_TA_CONFIG_SESSION_CACHE_TTL, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._list_cache_ttl = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_LIST_CACHE_TTL, 0), ARBORAPS_TA_CONFIG_LIST_CACHE_TTL, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._journal_ttl = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_JOURNAL_TTL, ARBORAPS_DEFAULT_JOURNAL_TTL), ARBORAPS_TA_CONFIG_JOURNAL_TTL, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._max_concurrent_requests = self._validate_integer(
+            self,
+            config.get(ARBORAPS_TA_CONFIG_MAX_CONCURRENT_REQUESTS, ARBORAPS_DEFAULT_MAX_CONCURRENT_REQUESTS),
+            ARBORAPS_TA_CONFIG_MAX_CONCURRENT_REQUESTS,
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._connect_timeout = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_CONNECT_TIMEOUT, ARBORAPS_DEFAULT_CONNECT_TIMEOUT), ARBORAPS_TA_CONFIG_CONNECT_TIMEOUT
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._read_timeout = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_READ_TIMEOUT, ARBORAPS_DEFAULT_READ_TIMEOUT), ARBORAPS_TA_CONFIG_READ_TIMEOUT
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._max_requests_per_second = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_MAX_REQUESTS_PER_SECOND, 0), ARBORAPS_TA_CONFIG_MAX_REQUESTS_PER_SECOND, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._circuit_breaker_threshold = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_THRESHOLD, 0), ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_THRESHOLD, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._circuit_breaker_cooldown = self._validate_integer(
+            self,
+            config.get(ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_COOLDOWN, ARBORAPS_DEFAULT_CIRCUIT_BREAKER_COOLDOWN),
+            ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_COOLDOWN,
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        ret_val, self._action_timeout = self._validate_integer(
+            self, config.get(ARBORAPS_TA_CONFIG_ACTION_TIMEOUT, 0), ARBORAPS_TA_CONFIG_ACTION_TIMEOUT, allow_zero=True
+        )
+        if phantom.is_fail(ret_val):
+            return self.get_status()
+
+        # Load the state file of the asset, it holds the cached login session
+        self._root_state = self.load_state()
+        if not isinstance(self._root_state, dict):
+            self._root_state = {}
+
+        self._devices = [ArborApsDevice(server_url, self._root_state)]
+
+        # The other devices keep their part of the state under their URL, the parts of the devices no longer configured
+        # are dropped
+        device_states = self._root_state.pop(ARBORAPS_STATE_DEVICES, {})
+        for url in re.split(ARBORAPS_IP_LIST_SEPARATORS, config.get(ARBORAPS_TA_CONFIG_ADDITIONAL_SERVER_URLS) or ""):
+            url = url.strip("/")
+            if url and url not in [device.server_url for device in self._devices]:
+                self._devices.append(ArborApsDevice(url, device_states.get(url, {})))
+
+        if len(self._devices) > 1:
+            self._root_state[ARBORAPS_STATE_DEVICES] = {device.server_url: device.state for device in self._devices[1:]}
+
+        def initialize_device(device):
+            device.session.pool_size = self._max_concurrent_requests
+            device.session.timeout = (self._connect_timeout, self._read_timeout)
+
+            # The rate limit and the circuit of an appliance hold for every action run sending it requests, whichever
+            # asset it comes from
+            if self._max_requests_per_second or self._circuit_breaker_threshold:
+                url_hash = hashlib.sha256(device.server_url.encode()).hexdigest()[:16]
+                shared_state = SharedState(os.path.join(self.get_state_dir(), ARBORAPS_SHARED_STATE_FILE.format(url_hash)))
+                if self._max_requests_per_second:
+                    device.rate_limiter = RateLimiter(shared_state, self._max_requests_per_second)
+                if self._circuit_breaker_threshold:
+                    device.circuit_breaker = CircuitBreaker(shared_state, self._circuit_breaker_threshold, self._circuit_breaker_cooldown)
+
+            # The expiries of the blocks and the snapshots of the poller are changed by every action run of the asset
+            # changing the lists, they are kept out of the state file, which is written back whole by each run
+            url_hash = hashlib.sha256(device.server_url.encode()).hexdigest()[:16]
+            device.expiries = SharedState(os.path.join(self.get_state_dir(), ARBORAPS_EXPIRIES_FILE.format(self.get_asset_id(), url_hash)))
+            device.poll_snapshots = SharedState(os.path.join(self.get_state_dir(), ARBORAPS_POLL_FILE.format(self.get_asset_id(), url_hash)))
+
+            # Drop the snapshots of the poller of a previous configuration, the changes made since are not ingested
+            if not self._ingest_list_changes_enabled and os.path.exists(device.poll_snapshots.path):
+                os.remove(device.poll_snapshots.path)
+
+            self._restore_cached_session()
+
+            # Drop the list snapshots of a previous configuration
+            if not self._list_cache_ttl:
+                self._state.pop(ARBORAPS_STATE_LIST_CACHE, None)
+
+            self._prune_journal()
+
+        self._run_on_devices(initialize_device)
 
         # Custom validation for IP address
         self.set_validator(ARBORAPS_TA_PARAM_IP, self._is_ip)
 
         return phantom.APP_SUCCESS
 
-    def _is_ip(self, cidr_ip_address):
-        """Function that checks given address and return True if address is valid IPv4 address.
+    def _validate_integer(self, action_result, parameter, key, allow_zero=False):
+        """Function that validates an integer value of the asset configuration or of an action parameter.
 
-        :param cidr_ip_address: IP address
-        :return: status (success/failure)
+        :param action_result: object of Action Result (or the connector itself for the asset configuration)
+        :param parameter: value to validate
+        :param key: name of the parameter
+        :param allow_zero: whether zero is a valid value (Default will be False)
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), integer value
+        """
+
+        try:
+            if not float(parameter).is_integer():
+                raise ValueError
+            parameter = int(parameter)
+        except (TypeError, ValueError):
+            return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_INVALID_INTEGER.format(key=key)), None)
+
+        if parameter < 0 or (parameter == 0 and not allow_zero):
+            return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_INVALID_INTEGER.format(key=key)), None)
+
+        return RetVal(phantom.APP_SUCCESS, parameter)
+
+    def _restore_cached_session(self):
+        """Function that reuses the login session cookie saved in the state file by a previous action run, if it has not
+        expired yet. If the appliance rejects the cookie, _make_rest_call will log in again.
+
+        :return: None
         """
 
+        cached_session = self._state.get(ARBORAPS_STATE_SESSION)
+        if not self._session_cache_ttl or not cached_session:
+            return
+
+        if cached_session.get("expires_at", 0) <= time.time():
+            self._state.pop(ARBORAPS_STATE_SESSION, None)
+            return
+
+        import encryption_helper
+
         try:
-            ip_address, net_mask = _break_ip_address(cidr_ip_address)
+            cookies = json.loads(encryption_helper.decrypt(cached_session["cookies"], self.get_asset_id()))
         except Exception as e:
-            self.debug_print(ARBORAPS_INVALID_IP, e)
-            return False
+            self.debug_print(ARBORAPS_SESSION_CACHE_DECRYPT_ERROR, e)
+            self._state.pop(ARBORAPS_STATE_SESSION, None)
+            return
 
-        # Validate IP address
-        if not phantom.is_ip(ip_address):
-            self.debug_print(ARBORAPS_INVALID_IP)
-            return False
+        self._aps_session.reset()
+        self._aps_session.session.cookies.update(cookies)
+        self._aps_session.authenticated = True
+        self._aps_session.from_cache = True
+
+    def _cache_session(self):
+        """Function that saves the cookie of the current login session (encrypted) in the state file, so that
+        following action runs can skip the login.
+
+        :return: None
+        """
+
+        if not self._session_cache_ttl:
+            return
+
+        import encryption_helper
+
+        cookies = json.dumps(self._aps_session.session.cookies.get_dict())
+
+        self._state[ARBORAPS_STATE_SESSION] = {
+            "cookies": encryption_helper.encrypt(cookies, self.get_asset_id()),
+            "expires_at": time.time() + self._session_cache_ttl,
+        }
+
+    def _prune_journal(self):
+        """Function that drops the journal entries of the state file older than the configured TTL.
+
+        :return: None
+        """
+
+        journal = self._state.get(ARBORAPS_STATE_JOURNAL)
+        if journal is None:
+            return
+
+        for key, changes in list(journal.items()):
+            if not self._journal_ttl or changes["created_at"] + self._journal_ttl <= time.time():
+                del journal[key]
+
+        if not journal:
+            self._state.pop(ARBORAPS_STATE_JOURNAL, None)
+
+    def _get_journal_key(self, param_values):
+        """Function that returns the key of the journal entry of a bulk change, the same for every run of the same
+        action with the same parameters.
+
+        :param param_values: JSON serializable values identifying the change
+        :return: key
+        """
+
+        return hashlib.sha256(json.dumps([self.get_action_identifier(), *param_values]).encode()).hexdigest()
+
+    def _save_state(self):
+        """Function that saves the state of the asset while an action is running, other devices may be updating their
+        part of the state concurrently.
+
+        :return: None
+        """
+
+        # The C JSON encoder copies the state without letting the other threads run
+        with self._state_lock:
+            self.save_state(json.loads(json.dumps(self._root_state)))
+
+    def _run_on_devices(self, function):
+        """Function that calls the given function for every APS device of the asset, concurrently when there are more
+        than one, with the device set as the current device of the calling thread.
+
+        :param function: function to call with each device
+        :return: list of the results, in the order of the devices
+        """
+
+        def run_on_device(device):
+            self._local.device = device
+            try:
+                return function(device)
+            finally:
+                self._local.device = None
+
+        if len(self._devices) <= 1:
+            return [run_on_device(device) for device in self._devices]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(self._devices)) as executor:
+            return list(executor.map(run_on_device, self._devices))
+
+    def _fan_out(self, action_function, param):
+        """Function that handles a param on every APS device of the asset concurrently, so that the action takes as long
+        as the slowest device. Each device adds its own action results, which tell the device in their summary.
+
+        :param action_function: handler of the action
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR, success only if the param succeeded on every device
+        """
+
+        def handle_param(device):
+            self._local.action_results = []
+            try:
+                return action_function(param), self._local.action_results
+            finally:
+                self._local.action_results = None
+
+        results = self._run_on_devices(handle_param)
+
+        # Add the action results in the order of the devices, whichever device finished first
+        for device, (_, action_results) in zip(self._devices, results):
+            for action_result in action_results:
+                action_result.update_summary({"server_url": device.server_url})
+                super().add_action_result(action_result)
+
+        if all(phantom.is_success(ret_val) for ret_val, _ in results):
+            return phantom.APP_SUCCESS
+
+        return phantom.APP_ERROR
+
+    def _handle_coalesced(self, action_function, param):
+        """Function that handles a param of the single IP actions, reusing the outcome of an earlier param of the action
+        run for the same host and options instead of sending the same requests to the APS again.
+
+        :param action_function: handler of the action
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        # '1.1.1.1' and '1.1.1.1/32' are the same host of the APS, the IP has been validated by _is_ip
+        options = {key: value for key, value in param.items() if key not in (ARBORAPS_TA_PARAM_IP, "context")}
+        host_address = _get_host_address(param[ARBORAPS_TA_PARAM_IP])
+        key = json.dumps([self._server_url, host_address, options], sort_keys=True)
+
+        outcome = self._param_outcomes.get(key)
+        if outcome is not None:
+            self.save_progress(ARBORAPS_PARAM_COALESCED_MSG.format(host_address))
+
+            action_result = self.add_action_result(ActionResult(dict(param)))
+            for data in outcome["data"]:
+                action_result.add_data(dict(data))
+            action_result.update_summary(dict(outcome["summary"]))
+
+            return action_result.set_status(phantom.APP_SUCCESS, outcome["message"])
+
+        ret_val = action_function(param)
+
+        # Only a success is reused, a failed param may succeed when it is tried again
+        if phantom.is_success(ret_val):
+            action_results = getattr(self._local, "action_results", None) or self.get_action_results()
+            action_result = action_results[-1]
+            self._param_outcomes[key] = {
+                "message": action_result.get_message(),
+                "data": [dict(data) for data in action_result.get_data()],
+                "summary": dict(action_result.get_summary()),
+            }
+
+        return ret_val
+
+    def add_action_result(self, action_result):
+        """Add the action result of a param, held back until every device is done while the param is fanned out.
+
+        :param action_result: object of Action Result
+        :return: object of Action Result
+        """
+
+        action_results = getattr(self._local, "action_results", None)
+        if action_results is None:
+            return super().add_action_result(action_result)
+
+        action_results.append(action_result)
+        return action_result
+
+    def _is_ip(self, cidr_ip_address):
+        """Function that checks given address and return True if address is valid IPv4 or IPv6 address or CIDR.
+
+        :param cidr_ip_address: IP address
+        :return: status (success/failure)
+        """
 
-        # Check if net mask is out of range
-        if net_mask not in list(range(0, 33)):
+        if not isinstance(cidr_ip_address, str) or parse_host(cidr_ip_address) is None:
             self.debug_print(ARBORAPS_INVALID_IP)
             return False
 
@@ -135,6 +809,9 @@ class ArborApsConnector(BaseConnector):
         status_code = response.status_code
 
         try:
+            # Only error pages need BeautifulSoup, don't pay for its import on the success paths
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(response.text, "html.parser")
             error_text = soup.text
             split_lines = error_text.split("\n")
@@ -188,7 +865,11 @@ class ArborApsConnector(BaseConnector):
         # store the r_text in debug data, it will get dumped in the logs if the action fails
         if hasattr(action_result, "add_debug_data"):
             action_result.add_debug_data({"r_status_code": response.status_code})
-            action_result.add_debug_data({"r_text": response.text})
+            # Large bodies (e.g. the list of a big blocklist) are not copied
+            if len(response.content) <= ARBORAPS_DEBUG_DATA_MAX_SIZE:
+                action_result.add_debug_data({"r_text": response.text})
+            else:
+                action_result.add_debug_data({"r_text": ARBORAPS_DEBUG_DATA_TRUNCATED.format(len(response.content))})
             action_result.add_debug_data({"r_headers": response.headers})
 
         # Process each 'Content-Type' of response separately
@@ -215,7 +896,75 @@ class ArborApsConnector(BaseConnector):
 
         return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
 
-    def _make_rest_call(self, endpoint, action_result, params=None, data=None, method="get"):
+    def _process_probe_response(self, response, action_result):
+        """This function is the fast path of _process_response for the successful responses of the existence checks.
+        The small body is parsed directly and nothing is copied to the debug data, anything unexpected is left to
+        _process_response.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), response obtained
+        """
+
+        if not response.content:
+            return RetVal(phantom.APP_SUCCESS, {})
+
+        if "json" in response.headers.get("Content-Type", ""):
+            try:
+                return RetVal(phantom.APP_SUCCESS, json.loads(response.content))
+            except ValueError:
+                pass
+
+        return self._process_response(response, action_result)
+
+    def _is_session_expired(self, response):
+        """Function that checks whether the appliance rejected the request because the login session is no longer valid.
+
+        :param response: response data
+        :return: True if a new login is required, False otherwise
+        """
+
+        if response.status_code in ARBORAPS_SESSION_EXPIRED_STATUS_CODES:
+            return True
+
+        # An expired session gets redirected to the login form
+        return ARBORAPS_TA_REST_LOGIN in (response.url or "")
+
+    def _get_retry_delay(self, response, attempt):
+        """Function that returns how many seconds to wait before retrying a throttled request. The 'Retry-After' header
+        of the appliance is honoured, otherwise the delay grows exponentially with each attempt.
+
+        :param response: response data
+        :param attempt: number of the failed attempt, starting at 0
+        :return: delay in seconds
+        """
+
+        try:
+            delay = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            delay = ARBORAPS_THROTTLE_BACKOFF_FACTOR * 2**attempt
+
+        return min(max(delay, 0), ARBORAPS_THROTTLE_MAX_DELAY)
+
+    def _get_metric_name(self, method, endpoint):
+        """Function that returns the name under which the calls to an endpoint are counted. The IP of the endpoints of
+        a single list entry is replaced by a placeholder, so that these calls are counted together.
+
+        :param method: GET/POST/PUT/DELETE
+        :param endpoint: REST endpoint
+        :return: metric name
+        """
+
+        for list_endpoint in ARBORAPS_LIST_ENDPOINTS.values():
+            if endpoint.startswith(list_endpoint) and endpoint != list_endpoint:
+                endpoint = f"{list_endpoint}{{ip}}/"
+                break
+
+        return f"{method.upper()} {endpoint}"
+
+    def _make_rest_call(
+        self, endpoint, action_result, params=None, data=None, method="get", relogin=True, stream=False, headers=None, probe=False
+    ):
         """Function that makes the REST call to the device. It's a generic function that can be called from various
         action handlers.
 
@@ -224,6 +973,11 @@ class ArborApsConnector(BaseConnector):
         :param params: request parameters
         :param data: request body
         :param method: GET/POST/PUT/DELETE (Default will be GET)
+        :param relogin: log in again and replay the request once if the session has expired (Default will be True)
+        :param stream: return the response object of a successful JSON response (or of a 304 response to a conditional
+        request) without reading its body, so that the caller can stream it (Default will be False)
+        :param headers: request headers
+        :param probe: process a successful response with _process_probe_response (Default will be False)
         :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message),
         response obtained by making an API call
         """
@@ -231,17 +985,130 @@ class ArborApsConnector(BaseConnector):
         resp_json = None
 
         try:
-            request_func = getattr(self._session, method)
+            request_func = getattr(self._aps_session.session, method)
         except AttributeError:
             return RetVal(action_result.set_status(phantom.APP_ERROR, f"Invalid method: {method}"), resp_json)
 
-        try:
-            r = request_func(f"{self._server_url}{endpoint}", verify=self._verify_server_cert, data=data, params=params)
-        except Exception as e:
-            return RetVal(action_result.set_status(phantom.APP_ERROR, f"Error Connecting to server. Details: {e!s}"), resp_json)
+        generation = self._aps_session.generation
+        metric_name = self._get_metric_name(method, endpoint)
+        rate_limiter = self._device.rate_limiter
+        circuit_breaker = self._device.circuit_breaker
+
+        # Fail fast while the appliance is unhealthy
+        retry_in = circuit_breaker.check() if circuit_breaker else 0
+        if retry_in:
+            return RetVal(
+                action_result.set_status(
+                    phantom.APP_ERROR,
+                    ARBORAPS_CIRCUIT_OPEN.format(server_url=self._server_url, threshold=self._circuit_breaker_threshold, retry_in=retry_in),
+                ),
+                resp_json,
+            )
+
+        call_start_time = time.monotonic()
+
+        for attempt in range(ARBORAPS_THROTTLE_MAX_RETRIES + 1):
+            if rate_limiter:
+                rate_limiter.acquire()
+
+            start_time = time.monotonic()
+            try:
+                r = request_func(
+                    f"{self._server_url}{endpoint}",
+                    verify=self._verify_server_cert,
+                    data=data,
+                    params=params,
+                    stream=stream,
+                    headers=headers,
+                    timeout=self._aps_session.timeout,
+                )
+            except Exception as e:
+                from requests.exceptions import Timeout
+
+                self._metrics.record(metric_name, time.monotonic() - call_start_time, retries=attempt)
+                if circuit_breaker:
+                    circuit_breaker.record(success=False)
+                if isinstance(e, Timeout):
+                    return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_TIMEOUT_ERROR.format(e)), resp_json)
+                return RetVal(action_result.set_status(phantom.APP_ERROR, f"Error Connecting to server. Details: {e!s}"), resp_json)
+
+            self.debug_print(
+                ARBORAPS_REST_CALL_TIMING.format(
+                    method=method.upper(),
+                    endpoint=endpoint,
+                    status_code=r.status_code,
+                    total=time.monotonic() - start_time,
+                    elapsed=r.elapsed.total_seconds(),
+                    attempt=attempt + 1,
+                )
+            )
+
+            # Back off while the appliance is overloaded
+            if r.status_code not in ARBORAPS_THROTTLE_STATUS_CODES or attempt == ARBORAPS_THROTTLE_MAX_RETRIES:
+                break
+
+            delay = self._get_retry_delay(r, attempt)
+            self.debug_print(ARBORAPS_THROTTLED_MSG.format(status_code=r.status_code, delay=delay))
+
+            # Slow down the other action runs too
+            if rate_limiter:
+                rate_limiter.pause(delay)
+
+            time.sleep(delay)
+
+        if circuit_breaker:
+            circuit_breaker.record(success=r.status_code < 500)
+
+        # Retries of urllib3 (connection errors) come on top of the throttling retries, the body of a streamed response
+        # is counted by its reader
+        urllib3_retries = getattr(r.raw, "retries", None)
+        self._metrics.record(
+            metric_name,
+            time.monotonic() - call_start_time,
+            bytes_in=0 if stream else len(r.content),
+            bytes_out=len(r.request.body or ""),
+            retries=attempt + len(urllib3_retries.history if urllib3_retries else ()),
+        )
+
+        # The appliance dropped our session (e.g. idle timeout), log in again and replay the request once
+        if (
+            relogin
+            and self._aps_session.authenticated
+            and endpoint not in (ARBORAPS_TA_REST_LOGIN, ARBORAPS_TA_REST_LOGOUT)
+            and self._is_session_expired(r)
+        ):
+            self.debug_print(ARBORAPS_SESSION_EXPIRED)
+
+            with self._aps_session.lock:
+                # Another worker thread may have logged in again already
+                ret_val = phantom.APP_SUCCESS
+                if self._aps_session.generation == generation:
+                    ret_val, _ = self._login(action_result, force=True)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), resp_json)
+
+            return self._make_rest_call(
+                endpoint, action_result, params=params, data=data, method=method, relogin=False, stream=stream, headers=headers, probe=probe
+            )
+
+        if stream and (r.status_code == 304 or (200 <= r.status_code < 300 and "json" in r.headers.get("Content-Type", ""))):
+            return RetVal(phantom.APP_SUCCESS, r)
+
+        if probe and 200 <= r.status_code < 300:
+            return self._process_probe_response(r, action_result)
+
+        # The page returned by the logout doesn't matter, only its status code
+        if endpoint == ARBORAPS_TA_REST_LOGOUT and 200 <= r.status_code < 300:
+            return RetVal(phantom.APP_SUCCESS, resp_json)
 
         # In case of login, check for successful login
         if endpoint == ARBORAPS_TA_REST_LOGIN:
+            # Only the login form (i.e. invalid credentials) needs to be parsed, the page of a successful login doesn't
+            if r.status_code == 200 and "Username" not in r.text:
+                return RetVal(phantom.APP_SUCCESS, resp_json)
+
             _, _ = self._process_response(r, action_result)
             if r.status_code == 200:
                 # In case of invalid credential
@@ -258,14 +1125,26 @@ class ArborApsConnector(BaseConnector):
 
         return self._process_response(r, action_result)
 
-    def _login(self, action_result):
-        """This function tests the connectivity of an asset with given credentials.
+    def _login(self, action_result, force=False):
+        """This function logs in to the APS. The session is created once per action run and reused by every param.
 
         :param action_result: object of Action Result
+        :param force: discard the current session and log in again (Default will be False)
         :return: status success/failure
         """
 
-        self._session = requests.Session()
+        # Reuse the session of a previous param
+        if self._aps_session.authenticated and not force:
+            if not self._aps_session.param_logged_in:
+                self._aps_session.reuse_count += 1
+                self._aps_session.param_logged_in = True
+            return RetVal(action_result.set_status(phantom.APP_SUCCESS), {})
+
+        # Worker threads may still be using the pooled connections, only drop the cookies of an existing session
+        if self._aps_session.session is None:
+            self._aps_session.reset()
+        else:
+            self._aps_session.session.cookies.clear()
 
         # Make REST call
         ret_val, response = self._make_rest_call(
@@ -277,8 +1156,16 @@ class ArborApsConnector(BaseConnector):
 
         # Something went wrong
         if phantom.is_fail(ret_val):
+            self._aps_session.authenticated = False
+            self._state.pop(ARBORAPS_STATE_SESSION, None)
             return action_result.get_status(), response
 
+        self._aps_session.authenticated = True
+        self._aps_session.login_count += 1
+        self._aps_session.param_logged_in = True
+        self._aps_session.generation += 1
+        self._cache_session()
+
         return RetVal(action_result.set_status(phantom.APP_SUCCESS, response), {})
 
     def _logout(self):
@@ -299,69 +1186,1068 @@ class ArborApsConnector(BaseConnector):
 
         return phantom.APP_SUCCESS
 
-    def _handle_test_connectivity(self, param):
-        """This function tests the connectivity of an asset with given credentials.
+    def _get_list(self, list_name, action_result, host_handler, live=False):
+        """Function that fetches the entries of the blocklist or allowlist. The response is streamed and every entry is
+        passed to the handler as soon as it is parsed, so that large lists are never held in memory as a whole.
 
-        :param param: (not used in this method)
-        :return: status success/failure
+        :param list_name: blocklist/allowlist
+        :param action_result: object of Action Result
+        :param host_handler: function called with each entry of the list
+        :param live: ask the APS even if there is a fresh list snapshot, for the actions planning changes of the list
+        (Default will be False)
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), number of entries
         """
 
-        # Add an action result object to self (BaseConnector) to represent the action for this param
-        action_result = self.add_action_result(ActionResult(dict(param)))
-        self.save_progress(ARBORAPS_TA_CONNECTION_TEST_MSG)
+        cache = self._state.get(ARBORAPS_STATE_LIST_CACHE, {}).get(list_name) if self._list_cache_ttl else None
 
-        # Initiating login session
+        # Serve a fresh snapshot without asking the APS, only to the actions reading the list
+        if not live and self._is_list_cache_fresh(cache):
+            return RetVal(phantom.APP_SUCCESS, self._iter_cached_list(cache, host_handler))
+
+        # Initiating login session, only now that a request is needed
         ret_val, _ = self._login(action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
-            self.save_progress(f"{ARBORAPS_TEST_CONNECTIVITY_FAIL}")
-            return action_result.get_status()
+            return RetVal(action_result.get_status(), None)
 
-        # Return success
-        self.save_progress(ARBORAPS_TEST_CONNECTIVITY_PASS)
-        return action_result.set_status(phantom.APP_SUCCESS)
+        cached_hosts = {} if self._list_cache_ttl else None
+        num_hosts = 0
 
-    def _handle_list_ips(self, param):
-        """This function is used to list IPs on the blocklist or allowlist.
+        def handle_host(host):
+            nonlocal num_hosts
+            num_hosts += 1
+            host_handler(host)
+            if cached_hosts is not None:
+                cached_hosts[host["hostAddress"]] = host.get("updateTime")
 
-        :param param: dictionary of input parameters
-        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
-        """
+        ret_val, response_headers = self._fetch_list(list_name, action_result, handle_host, cache)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        # The list has not changed since the snapshot
+        if response_headers is None:
+            cache["fetched_at"] = time.time()
+            return RetVal(phantom.APP_SUCCESS, self._iter_cached_list(cache, host_handler))
+
+        if cached_hosts is not None:
+            self._state.setdefault(ARBORAPS_STATE_LIST_CACHE, {})[list_name] = {
+                "fetched_at": time.time(),
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "hosts": cached_hosts,
+            }
+
+        return RetVal(phantom.APP_SUCCESS, num_hosts)
+
+    def _fetch_list(self, list_name, action_result, host_handler, snapshot=None):
+        """Function that streams the entries of the blocklist or allowlist from the APS. Given a snapshot of the list,
+        the request is conditional so that the APS can tell that the list has not changed, if it supports it.
+
+        :param list_name: blocklist/allowlist
+        :param action_result: object of Action Result
+        :param host_handler: function called with each entry of the list
+        :param snapshot: list snapshot with the 'etag' and 'last_modified' of the response it was built from
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), response headers
+        (None if the list has not changed since the snapshot)
+        """
+
+        headers = {}
+        if snapshot and snapshot.get("etag"):
+            headers["If-None-Match"] = snapshot["etag"]
+        if snapshot and snapshot.get("last_modified"):
+            headers["If-Modified-Since"] = snapshot["last_modified"]
+
+        ret_val, response = self._make_rest_call(
+            endpoint=ARBORAPS_LIST_ENDPOINTS[list_name], action_result=action_result, stream=True, headers=headers
+        )
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        if not isinstance(response, dict) and response.status_code == 304:
+            response.close()
+            return RetVal(phantom.APP_SUCCESS, None)
+
+        key = ARBORAPS_LIST_RESPONSE_KEYS[list_name]
+
+        try:
+            if isinstance(response, dict):
+                hosts = response[key]
+            else:
+                hosts = _iter_json_array(self._count_bytes_in(response, ARBORAPS_LIST_ENDPOINTS[list_name]), key)
+
+            for host in hosts:
+                host_handler(host)
+        except Exception as e:
+            return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_LIST_PARSE_ERROR.format(e)), None)
+        finally:
+            if not isinstance(response, dict):
+                response.close()
+
+        return RetVal(phantom.APP_SUCCESS, {} if isinstance(response, dict) else response.headers)
+
+    def _count_bytes_in(self, response, endpoint):
+        """Function that reads the body of a streamed response in chunks and counts its bytes in the metrics.
+
+        :param response: streamed response
+        :param endpoint: REST endpoint of the response
+        :return: generator of body chunks
+        """
+
+        metric_name = self._get_metric_name("get", endpoint)
+
+        for chunk in response.iter_content(ARBORAPS_STREAM_CHUNK_SIZE):
+            self._metrics.add_bytes_in(metric_name, len(chunk))
+            yield chunk
+
+    def _is_list_cache_fresh(self, cache):
+        """Function that checks whether a list snapshot of the state file is younger than the configured TTL.
+
+        :param cache: list snapshot
+        :return: True if the snapshot can be used without asking the APS
+        """
+
+        return bool(cache) and time.time() - cache["fetched_at"] < self._list_cache_ttl
+
+    def _iter_cached_list(self, cache, host_handler):
+        """Function that passes every entry of a list snapshot to the handler.
+
+        :param cache: list snapshot
+        :param host_handler: function called with each entry of the list
+        :return: number of entries
+        """
+
+        for host_address, update_time in cache["hosts"].items():
+            host_handler({"hostAddress": host_address, "updateTime": update_time})
+
+        return len(cache["hosts"])
+
+    def _get_hosts(self, list_name, ip, action_result, removal=False):
+        """Function that fetches the entries of a host on the blocklist or allowlist from the APS. The APS keeps an entry
+        in the form it was added in, so the host is looked up both by its host address and in the form it was given,
+        e.g. 10.0.0.5/24. The list snapshot is never used here, the entries may have changed on the APS since it was
+        taken and the lookup decides whether the list is changed.
+
+        :param list_name: blocklist/allowlist
+        :param ip: IP or CIDR, as given
+        :param action_result: object of Action Result
+        :param removal: the host is looked up to be removed from the list (Default will be False)
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message),
+        list of the entries of the host (empty if the host is not on the list)
+        """
+
+        host_address = _get_host_address(ip)
+
+        # Initiating login session
+        ret_val, _ = self._login(action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        hosts = []
+        for entry_address in dict.fromkeys((host_address, ip)):
+            # Prepare endpoint
+            endpoint = f"{ARBORAPS_LIST_ENDPOINTS[list_name]}{entry_address}/"
+            self.save_progress(f"endpoint: {endpoint}")
+
+            ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result, probe=True)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), None)
+
+            if response:
+                hosts.append(response)
+
+            # Only a removal needs every entry of the host
+            if hosts and not removal:
+                break
+
+        return RetVal(phantom.APP_SUCCESS, hosts)
+
+    def _update_list(self, list_name, host_address, add, action_result):
+        """Function that adds a host to or removes a host from the blocklist or allowlist.
+
+        :param list_name: blocklist/allowlist
+        :param host_address: host address of the IP or CIDR
+        :param add: True to add the host, False to remove it
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message),
+        response obtained by making an API call
+        """
+
+        return self._make_rest_call(
+            endpoint=ARBORAPS_LIST_ENDPOINTS[list_name],
+            action_result=action_result,
+            method="post" if add else "delete",
+            params={"hostAddress": host_address},
+        )
+
+    def _run_concurrently(self, function, items, cancelled=None):
+        """Function that calls the given function for every item using a bounded pool of worker threads sharing the APS
+        session. The number of workers is limited by the 'max_concurrent_requests' asset configuration parameter. Once the
+        'action_timeout' of the param is reached, the items whose call has not started are cancelled, the calls in flight
+        are waited for so that the outcome of a request that reached the APS is never lost.
+
+        :param function: function to call with each item
+        :param items: list of items
+        :param cancelled: function returning the result of a cancelled item, the items are never cancelled without it
+        (Default will be None)
+        :return: list of the results, in the order of the items
+        """
+
+        deadline = self._deadline if cancelled else None
+
+        def is_cancelled():
+            return deadline is not None and time.monotonic() >= deadline
+
+        if self._max_concurrent_requests <= 1 or len(items) <= 1:
+            return [cancelled(item) if is_cancelled() else function(item) for item in items]
+
+        from concurrent.futures import ThreadPoolExecutor, wait
+
+        # The workers send their requests to the device of the calling thread
+        device = self._device
+
+        def run_on_device(item):
+            self._local.device = device
+            return function(item)
+
+        with ThreadPoolExecutor(max_workers=min(self._max_concurrent_requests, len(items))) as executor:
+            futures = [executor.submit(run_on_device, item) for item in items]
+            if deadline is not None:
+                wait(futures, timeout=max(deadline - time.monotonic(), 0))
+                # Only the calls that have not started can be cancelled
+                for future in futures:
+                    future.cancel()
+
+        return [cancelled(item) if future.cancelled() else future.result() for item, future in zip(items, futures)]
+
+    def _record_list_update(self, list_name, host_address, add, host=None):
+        """Function that keeps the list snapshots and the list index of the action run in step with a successful change
+        of the list, so that they do not need to be fetched again.
+
+        :param list_name: blocklist/allowlist
+        :param host_address: address of the entry, the host address of the IP or CIDR for an added host
+        :param add: True if the host was added, False if it was removed
+        :param host: list entry returned by the APS for an added host
+        :return: None
+        """
+
+        self._record_list_updates(list_name, [(host_address, add, host)])
+
+    def _record_list_updates(self, list_name, updates):
+        """Function that keeps the list snapshot of the state file, the snapshot of the poller and the list index of the
+        action run in step with successful changes of the list. The snapshot of the poller is shared with the concurrent
+        action runs of the asset, it is changed once for all the changes, under the lock of its file.
+
+        :param list_name: blocklist/allowlist
+        :param updates: list of (host address, add, host) tuples, as the parameters of _record_list_update
+        :return: None
+        """
+
+        updates = [(host_address, add, host or {"hostAddress": host_address, "updateTime": None}) for host_address, add, host in updates]
+        index = self._list_indexes.get(list_name)
+
+        for host_address, add, host in updates:
+            if index is not None and add:
+                index.add(host_address, host)
+            elif index is not None:
+                index.remove(host_address)
+
+        _update_snapshot_hosts(self._state.get(ARBORAPS_STATE_LIST_CACHE, {}).get(list_name), updates)
+
+        # The snapshot of the poller too, so that it doesn't report the changes made by this app
+        if not updates or not os.path.exists(self._poll_snapshots.path):
+            return
+
+        with self._poll_snapshots.open() as poll_snapshots:
+            _update_snapshot_hosts(poll_snapshots.get(list_name), updates)
+
+    def _get_ttl_from_param(self, param, action_result):
+        """Function that validates the 'ttl' parameter of the block actions.
+
+        :param param: dictionary of input parameters
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), TTL in seconds or None
+        """
+
+        ttl = param.get(ARBORAPS_TA_PARAM_TTL)
+        if ttl is None:
+            return RetVal(phantom.APP_SUCCESS, None)
+
+        return self._validate_integer(action_result, ttl, ARBORAPS_TA_PARAM_TTL)
+
+    def _set_block_expiries(self, blocks, ttl):
+        """Function that keeps the expiries of blocked hosts in the expiries file of the device, where the 'on poll' action
+        finds them. The file is read and written under a lock, so that the action runs of the asset blocking hosts at the
+        same time keep each other's expiries. The expiries are kept in a heap ordered by expiry time, along with the
+        current expiry of every host. Heap entries that no longer match the current expiry of their host are dropped
+        when they reach the top.
+
+        :param blocks: list of (host address, added) tuples, added is True if the host was just added and False if it
+        already was on the blocklist
+        :param ttl: seconds until the blocks expire, None to block the hosts permanently
+        :return: None
+        """
+
+        # Nothing to change for a permanent block of a host without an expiry
+        if not blocks or (ttl is None and not os.path.exists(self._expiries.path)):
+            return
+
+        now = time.time()
+
+        with self._expiries.open() as expiries:
+            hosts = expiries.setdefault("hosts", {})
+            expiries.setdefault("heap", [])
+
+            for host_address, added in blocks:
+                if ttl is None:
+                    hosts.pop(host_address, None)
+                    continue
+
+                # A host already blocked permanently stays blocked, a time-boxed block can only be extended
+                current_expiry = hosts.get(host_address)
+                if not added and current_expiry is None:
+                    continue
+
+                expires_at = max(now + ttl, current_expiry or 0)
+                if expires_at != current_expiry:
+                    _push_block_expiry(expiries, host_address, expires_at)
+
+    def _restore_block_expiries(self, expired):
+        """Function that puts back the expiries of blocks that could not be removed, for the next poll.
+
+        :param expired: dictionary of {host address: expiry time}
+        :return: None
+        """
+
+        if not expired:
+            return
+
+        with self._expiries.open() as expiries:
+            expiries.setdefault("hosts", {})
+            expiries.setdefault("heap", [])
+
+            for host_address, expires_at in expired.items():
+                # Unless the host was blocked again since
+                if host_address not in expiries["hosts"]:
+                    _push_block_expiry(expiries, host_address, expires_at)
+
+    def _clear_block_expiries(self, host_addresses):
+        """Function that drops the expiries of hosts removed from the blocklist.
+
+        :param host_addresses: list of the addresses of the removed entries
+        :return: None
+        """
+
+        if not host_addresses or not os.path.exists(self._expiries.path):
+            return
+
+        with self._expiries.open() as expiries:
+            for host_address in host_addresses:
+                expiries.get("hosts", {}).pop(_get_host_address(host_address), None)
+
+    def _get_block_expiries(self):
+        """Function that reads the expiries of the blocked hosts.
+
+        :return: dictionary of {host address: expiry time}
+        """
+
+        if not os.path.exists(self._expiries.path):
+            return {}
+
+        with self._expiries.open() as expiries:
+            return dict(expiries.get("hosts", {}))
+
+    def _pop_expired_blocks(self):
+        """Function that removes the expired blocks from the expiries file of the device.
+
+        :return: dictionary of {host address: expiry time} of the expired blocks
+        """
+
+        expired = {}
+
+        if not os.path.exists(self._expiries.path):
+            return expired
+
+        with self._expiries.open() as expiries:
+            heap, hosts = expiries.get("heap", []), expiries.get("hosts", {})
+            now = time.time()
+
+            while heap and heap[0][0] <= now:
+                expires_at, host_address = heapq.heappop(heap)
+
+                # Skip the entries of blocks that were extended, made permanent or removed since
+                if hosts.get(host_address) == expires_at:
+                    expired[host_address] = hosts.pop(host_address)
+
+        return expired
+
+    def _index_host(self, index, host):
+        """Function that adds an entry of a list to a network index.
+
+        :param index: NetworkIndex object
+        :param host: list entry as returned by the APS
+        :return: None
+        """
+
+        try:
+            index.add(host["hostAddress"], host)
+        except ValueError:
+            self.debug_print(ARBORAPS_INVALID_LIST_ENTRY.format(host.get("hostAddress")))
+
+    def _get_list_index(self, list_name, action_result, live=False):
+        """Function that returns an index of the entries of the blocklist or allowlist. The index is built once per
+        action run and kept in step with the changes made by the run.
+
+        :param list_name: blocklist/allowlist
+        :param action_result: object of Action Result
+        :param live: build the index from the APS even if there is a fresh list snapshot (Default will be False)
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), NetworkIndex object
+        """
+
+        index = self._list_indexes.get(list_name)
+        if index is not None:
+            return RetVal(phantom.APP_SUCCESS, index)
+
+        index = NetworkIndex()
+        ret_val, _ = self._get_list(list_name, action_result, lambda host: self._index_host(index, host), live)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return RetVal(action_result.get_status(), None)
+
+        self._list_indexes[list_name] = index
+
+        return RetVal(phantom.APP_SUCCESS, index)
+
+    def _get_covering_host(self, index, cidr_ip_address):
+        """Function that returns the widest list entry covering the given IP or CIDR with a shorter prefix.
+
+        :param index: NetworkIndex object of the list
+        :param cidr_ip_address: IP address in format of IP or IP/prefix_size
+        :return: list entry or None
+        """
+
+        network = ipaddress.ip_network(cidr_ip_address, strict=False)
+
+        for host in index.covering(network):
+            if ipaddress.ip_network(host["hostAddress"], strict=False).prefixlen < network.prefixlen:
+                return host
+
+        return None
+
+    def _apply_list_updates(self, list_name, updates, entry_addresses=None):
+        """Function that applies many changes to the blocklist or allowlist concurrently. A host is removed under the
+        addresses of its entries, which the APS may store in another form than the host address. The list snapshot and
+        the list index are kept in step with the changes that succeeded.
+
+        :param list_name: blocklist/allowlist
+        :param updates: list of (host address, add) tuples, add is True to add the host and False to remove it
+        :param entry_addresses: dictionary of {host address: list of the addresses of the entries of the host}, as
+        returned by _group_entry_addresses, a host missing from it is removed under its host address (Default will be None)
+        :return: list of (status, message) tuples, in the order of the updates
+        """
+
+        entry_addresses = entry_addresses or {}
+
+        def update_host(update):
+            host_address, add = update
+            changed_addresses = []
+
+            # Only initializing action_result for REST calls, not adding it to BaseConnector
+            host_action_result = ActionResult()
+
+            for address in [host_address] if add else entry_addresses.get(host_address, [host_address]):
+                ret_val, _ = self._update_list(list_name, address, add, host_action_result)
+
+                if phantom.is_fail(ret_val):
+                    return ARBORAPS_BULK_STATUS_FAILED, host_action_result.get_message(), changed_addresses
+
+                changed_addresses.append(address)
+
+            return (ARBORAPS_BULK_STATUS_ADDED if add else ARBORAPS_BULK_STATUS_REMOVED), "", changed_addresses
+
+        def cancel_update(update):
+            return ARBORAPS_BULK_STATUS_FAILED, ARBORAPS_CHANGE_CANCELLED.format(self._action_timeout), []
+
+        results = []
+        recorded_updates = []
+        removed_addresses = []
+        for (_, add), (status, message, changed_addresses) in zip(
+            updates, self._run_concurrently(update_host, updates, cancelled=cancel_update)
+        ):
+            recorded_updates.extend((address, add, None) for address in changed_addresses)
+            if not add:
+                removed_addresses.extend(changed_addresses)
+            results.append((status, message))
+
+        self._record_list_updates(list_name, recorded_updates)
+
+        # A host removed from the blocklist no longer has a block to expire
+        if list_name == ARBORAPS_LIST_BLOCKLIST:
+            self._clear_block_expiries(removed_addresses)
+
+        return results
+
+    def _get_ips_from_param(self, param, action_result):
+        """Function that collects the IPs of a bulk action from the 'ips' parameter and the vault file given in
+        the 'vault_id' parameter. Entries can be separated by commas or new lines. The duplicates are kept, so that the
+        position of an entry is its position in the input, the 'ips' parameter followed by the vault file.
+
+        :param param: dictionary of input parameters
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), list of IPs
+        """
+
+        values = [param.get(ARBORAPS_TA_PARAM_IPS) or ""]
+
+        vault_id = param.get(ARBORAPS_TA_PARAM_VAULT_ID)
+        if vault_id:
+            import phantom.rules as ph_rules
+
+            success, message, vault_info = ph_rules.vault_info(vault_id=vault_id)
+            vault_info = list(vault_info or [])
+
+            if not success or not vault_info:
+                return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_VAULT_FILE_ERROR.format(vault_id, message)), None)
+
+            try:
+                with open(vault_info[0]["path"]) as vault_file:
+                    values.append(vault_file.read())
+            except Exception as e:
+                return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_VAULT_FILE_ERROR.format(vault_id, e)), None)
+
+        ips = []
+        for value in values:
+            ips.extend(ip for ip in re.split(ARBORAPS_IP_LIST_SEPARATORS, value) if ip)
+
+        if not ips:
+            return RetVal(action_result.set_status(phantom.APP_ERROR, ARBORAPS_NO_IPS_PROVIDED), None)
+
+        return RetVal(phantom.APP_SUCCESS, ips)
+
+    def _handle_test_connectivity(self, param):
+        """This function tests the connectivity of an asset with given credentials.
+
+        :param param: (not used in this method)
+        :return: status success/failure
+        """
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+        self.save_progress(ARBORAPS_TA_CONNECTION_TEST_MSG)
+
+        # Initiating login session, always with the credentials so that a cached session does not hide a failure
+        ret_val, _ = self._login(action_result, force=True)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            self.save_progress(f"{ARBORAPS_TEST_CONNECTIVITY_FAIL}")
+            return action_result.get_status()
+
+        # Return success
+        self.save_progress(ARBORAPS_TEST_CONNECTIVITY_PASS)
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _handle_list_ips(self, param):
+        """This function is used to list IPs on the blocklist or allowlist.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        ret_val, offset = self._validate_integer(
+            action_result, param.get(ARBORAPS_TA_PARAM_OFFSET, 0), ARBORAPS_TA_PARAM_OFFSET, allow_zero=True
+        )
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        limit = param.get(ARBORAPS_TA_PARAM_LIMIT)
+        if limit is not None:
+            ret_val, limit = self._validate_integer(action_result, limit, ARBORAPS_TA_PARAM_LIMIT)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+        network_filter = param.get(ARBORAPS_TA_PARAM_FILTER)
+        if network_filter:
+            try:
+                network_filter = ipaddress.ip_network(network_filter, strict=False)
+            except ValueError:
+                return action_result.set_status(phantom.APP_ERROR, ARBORAPS_INVALID_FILTER)
+
+        # Hosts are added to the result while the response is parsed, in compact mode only their network is kept
+        compact = param.get(ARBORAPS_TA_PARAM_COMPACT, False)
+        ips = PackedNetworks() if compact else action_result.add_data({"hosts": []})["hosts"]
+        num_matches = 0
+
+        def add_host(host):
+            nonlocal num_matches
+
+            network = None
+            if network_filter or compact:
+                try:
+                    network = ipaddress.ip_network(host["hostAddress"], strict=False)
+                except ValueError:
+                    self.debug_print(ARBORAPS_INVALID_LIST_ENTRY.format(host["hostAddress"]))
+                    return
+
+            if network_filter and (network.version != network_filter.version or not network.overlaps(network_filter)):
+                return
+
+            num_matches += 1
+            if num_matches <= offset or (limit is not None and len(ips) >= limit):
+                return
+
+            if compact:
+                ips.add(network)
+            else:
+                ips.append(host)
+
+        # Get IPs from requested list
+        ret_val, num_hosts = self._get_list(param[ARBORAPS_TA_PARAM_LIST], action_result, add_host)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        self.save_progress(ARBORAPS_LIST_FETCHED_MSG.format(num_hosts))
+
+        if compact:
+            packed_networks = action_result.add_data(ips.to_dict())
+            action_result.update_summary({"num_ipv4_addresses": packed_networks["num_ipv4_addresses"]})
+
+        action_result.update_summary({"num_ips": len(ips), "total_ips": num_hosts})
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _handle_unblocklist_ip(self, param):
+        """This function is used to un-blocklist IP or CIDR.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        # Get blocklisted host
+        ret_val, hosts = self._get_hosts(ARBORAPS_LIST_BLOCKLIST, param[ARBORAPS_TA_PARAM_IP], action_result, removal=True)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # If IP is not present in blocklist
+        if not hosts:
+            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_UNBLOCKLISTED)
+
+        # Initiating login session, if the lookup didn't need one
+        ret_val, _ = self._login(action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # Delete every entry of the host from blocklist, under the address the APS keeps it as
+        for host in hosts:
+            # Prepare params
+            params = {"hostAddress": host["hostAddress"]}
+
+            ret_val, _ = self._make_rest_call(
+                endpoint=ARBORAPS_TA_REST_BLOCKLISTED_HOSTS, action_result=action_result, method="delete", params=params
+            )
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            self._record_list_update(ARBORAPS_LIST_BLOCKLIST, host["hostAddress"], False)
+
+        # A host removed from the blocklist no longer has a block to expire
+        self._clear_block_expiries([host["hostAddress"] for host in hosts])
+
+        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_UNBLOCKLISTED_SUCCESSFULLY)
+
+    def _handle_blocklist_ip(self, param):
+        """This function is used to blocklist IP or CIDR.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        ret_val, ttl = self._get_ttl_from_param(param, action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # Get required parameter
+        ip_address = _get_host_address(param[ARBORAPS_TA_PARAM_IP])
+
+        # Skip the IP if a wider entry of the blocklist already covers it
+        if param.get(ARBORAPS_TA_PARAM_SKIP_COVERED, False):
+            ret_val, index = self._get_list_index(ARBORAPS_LIST_BLOCKLIST, action_result, live=True)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            covering_host = self._get_covering_host(index, param[ARBORAPS_TA_PARAM_IP])
+            if covering_host:
+                action_result.add_data(_add_update_time_iso(dict(covering_host)))
+                return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_COVERED.format(covering_host["hostAddress"]))
+
+        # Get blocklisted host
+        ret_val, hosts = self._get_hosts(ARBORAPS_LIST_BLOCKLIST, param[ARBORAPS_TA_PARAM_IP], action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # If IP already present in blocklist
+        if hosts:
+            self._set_block_expiries([(ip_address, False)], ttl)
+
+            # Add the response into the data section
+            action_result.add_data(_add_update_time_iso(hosts[0]))
+            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_BLOCKLISTED)
+
+        # Initiating login session, if the lookup didn't need one
+        ret_val, _ = self._login(action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # Prepare params
+        params = {"hostAddress": ip_address}
+
+        # Add IP in blocklist
+        ret_val, response = self._make_rest_call(
+            endpoint=ARBORAPS_TA_REST_BLOCKLISTED_HOSTS, action_result=action_result, method="post", params=params
+        )
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        self._record_list_update(ARBORAPS_LIST_BLOCKLIST, ip_address, True, response)
+        self._set_block_expiries([(ip_address, True)], ttl)
+
+        # Add the response into the data section
+        action_result.add_data(_add_update_time_iso(response))
+
+        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_BLOCKLISTED_SUCCESSFULLY)
+
+    def _handle_unallowlist_ip(self, param):
+        """This function is used to un-allowlist IP or CIDR.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        # Get allowlisted host
+        ret_val, hosts = self._get_hosts(ARBORAPS_LIST_ALLOWLIST, param[ARBORAPS_TA_PARAM_IP], action_result, removal=True)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # If IP is not present in allowlist
+        if not hosts:
+            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_UNALLOWLISTED)
+
+        # Initiating login session, if the lookup didn't need one
+        ret_val, _ = self._login(action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # Delete every entry of the host from allowlist, under the address the APS keeps it as
+        for host in hosts:
+            # Prepare params
+            params = {"hostAddress": host["hostAddress"]}
+
+            ret_val, _ = self._make_rest_call(
+                endpoint=ARBORAPS_TA_REST_ALLOWLISTED_HOSTS, action_result=action_result, method="delete", params=params
+            )
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            self._record_list_update(ARBORAPS_LIST_ALLOWLIST, host["hostAddress"], False)
+
+        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_UNALLOWLISTED_SUCCESSFULLY)
+
+    def _handle_allowlist_ip(self, param):
+        """This function is used to allowlist IP or CIDR.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        # Get required parameter
+        ip_address = _get_host_address(param[ARBORAPS_TA_PARAM_IP])
+
+        # Skip the IP if a wider entry of the allowlist already covers it
+        if param.get(ARBORAPS_TA_PARAM_SKIP_COVERED, False):
+            ret_val, index = self._get_list_index(ARBORAPS_LIST_ALLOWLIST, action_result, live=True)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            covering_host = self._get_covering_host(index, param[ARBORAPS_TA_PARAM_IP])
+            if covering_host:
+                action_result.add_data(_add_update_time_iso(dict(covering_host)))
+                return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_COVERED.format(covering_host["hostAddress"]))
+
+        # Get allowlisted host
+        ret_val, hosts = self._get_hosts(ARBORAPS_LIST_ALLOWLIST, param[ARBORAPS_TA_PARAM_IP], action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # If IP already present in allowlist
+        if hosts:
+            # Add the response into the data section
+            action_result.add_data(_add_update_time_iso(hosts[0]))
+            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_ALLOWLISTED)
+
+        # Initiating login session, if the lookup didn't need one
+        ret_val, _ = self._login(action_result)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        # Prepare params
+        params = {"hostAddress": ip_address}
+
+        # Add IP in allowlist
+        ret_val, response = self._make_rest_call(
+            endpoint=ARBORAPS_TA_REST_ALLOWLISTED_HOSTS, action_result=action_result, method="post", params=params
+        )
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.get_status()
+
+        self._record_list_update(ARBORAPS_LIST_ALLOWLIST, ip_address, True, response)
+
+        # Add the response into the data section
+        action_result.add_data(_add_update_time_iso(response))
+
+        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALLOWLISTED_SUCCESSFULLY)
+
+    def _handle_bulk_update(self, param):
+        """This function is used to add or remove many IPs or CIDRs on the blocklist or allowlist. The list is fetched once and
+        only the entries that need to change are sent to the APS.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
 
         self.save_progress(f"In action handler for: {self.get_action_identifier()}")
 
         # Add an action result object to self (BaseConnector) to represent the action for this param
         action_result = self.add_action_result(ActionResult(dict(param)))
 
-        # Initiating login session
-        ret_val, _ = self._login(action_result)
+        list_name, add = ARBORAPS_BULK_ACTIONS[self.get_action_identifier()]
+        skip_covered = add and param.get(ARBORAPS_TA_PARAM_SKIP_COVERED, False)
+
+        ret_val, ttl = self._get_ttl_from_param(param, action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # Prepare endpoint
-        endpoint = ARBORAPS_TA_REST_BLOCKLISTED_HOSTS if param["list"] == "blocklist" else ARBORAPS_TA_REST_ALLOWLISTED_HOSTS
-
-        # Get IPs from requested list
-        ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result)
+        ret_val, input_ips = self._get_ips_from_param(param, action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        ips = response.pop("{}ed-hosts".format("blacklist" if param["list"] == "blocklist" else "whitelist"))
-        self.save_progress(f"ips: {ips}")
-        response["hosts"] = ips
+        changed_status = ARBORAPS_BULK_STATUS_ADDED if add else ARBORAPS_BULK_STATUS_REMOVED
+        counts = dict.fromkeys((changed_status, ARBORAPS_BULK_STATUS_SKIPPED, ARBORAPS_BULK_STATUS_FAILED), 0)
+        hosts, invalid = normalize_hosts(input_ips)
+
+        # Duplicates are dropped, an invalid IP is reported once with every entry it appears at
+        host_addresses = dict(zip(input_ips, hosts))
+        ips = list(host_addresses)
+        results = {
+            ip: (ARBORAPS_BULK_STATUS_FAILED, ARBORAPS_INVALID_IP_ENTRY.format(entries)) for ip, entries in _get_invalid_entries(invalid).items()
+        }
 
-        action_result.add_data(response)
-        action_result.update_summary({"num_ips": len(ips)})
+        # A previous run of the same changes that did not complete left the outcome of every host in the journal,
+        # {host address: [status, message]}, status is None for the changes it could not confirm
+        journal_key = self._get_journal_key([skip_covered, ips])
+        journal = self._state.get(ARBORAPS_STATE_JOURNAL, {}).get(journal_key) if self._journal_ttl else None
+        entries = journal["entries"] if journal else {}
+        completed = {host_address: entry for host_address, entry in entries.items() if entry[0] not in (None, ARBORAPS_BULK_STATUS_FAILED)}
+
+        # Work out which IPs need a change, several IPs can map to the same host address (e.g. 1.1.1.1 and 1.1.1.1/32)
+        updates = {}
+        # {host address: list of the addresses of the entries of the host}
+        existing_hosts = {}
+
+        # Unless the journal has the outcome of every host, the list is needed to plan the remaining changes
+        if len(completed) < len(entries) or not journal:
+            # Initiating login session
+            ret_val, _ = self._login(action_result)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            # Get the current entries of the list once, instead of checking every IP on the APS
+            list_addresses = []
+            index = NetworkIndex() if skip_covered else None
+
+            def add_host(host):
+                list_addresses.append(host["hostAddress"])
+                if index is not None:
+                    self._index_host(index, host)
+
+            ret_val, _ = self._get_list(list_name, action_result, add_host, live=True)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            existing_hosts = _group_entry_addresses(list_addresses)
+
+            if index is not None:
+                self._list_indexes[list_name] = index
+
+            for ip in ips:
+                if ip in results:
+                    continue
+
+                host_address = host_addresses[ip]
+                if host_address in completed:
+                    continue
+
+                covering_host = self._get_covering_host(index, ip) if skip_covered else None
+
+                if (host_address in existing_hosts) == add or host_address in updates:
+                    results[ip] = (ARBORAPS_BULK_STATUS_SKIPPED, ARBORAPS_BULK_NOTHING_TO_DO)
+                elif covering_host:
+                    results[ip] = (ARBORAPS_BULK_STATUS_SKIPPED, ARBORAPS_ALREADY_COVERED.format(covering_host["hostAddress"]))
+                else:
+                    updates[host_address] = add
+
+                entries[host_address] = [None, ""] if host_address in updates else list(results[ip])
+
+        # Write the planned changes ahead of making them, so that a run that fails partway through can be resumed
+        if updates and self._journal_ttl:
+            journal = self._state.setdefault(ARBORAPS_STATE_JOURNAL, {})[journal_key] = {"created_at": time.time(), "entries": entries}
+            self._save_state()
+
+        updates = list(updates.items())
+        update_results = {}
+
+        for start in range(0, len(updates), ARBORAPS_JOURNAL_SAVE_INTERVAL):
+            chunk = updates[start : start + ARBORAPS_JOURNAL_SAVE_INTERVAL]
+
+            for (host_address, _), (status, message) in zip(chunk, self._apply_list_updates(list_name, chunk, existing_hosts)):
+                update_results[host_address] = (status, message)
+                entries[host_address] = [status, message]
+
+            if journal:
+                self._save_state()
+
+        if list_name == ARBORAPS_LIST_BLOCKLIST and add:
+            self._set_block_expiries(
+                [
+                    (host_address, status == ARBORAPS_BULK_STATUS_ADDED)
+                    for host_address, (status, message) in entries.items()
+                    if status == ARBORAPS_BULK_STATUS_ADDED or message == ARBORAPS_BULK_NOTHING_TO_DO
+                ],
+                ttl,
+            )
+
+        num_resumed = 0
+        resumed_hosts = set()
+        for ip in ips:
+            host_address = None if ip in results else host_addresses[ip]
+
+            if host_address is None:
+                status, message = results[ip]
+            elif host_address in update_results:
+                status, message = update_results[host_address]
+            elif host_address in resumed_hosts:
+                status, message = ARBORAPS_BULK_STATUS_SKIPPED, ARBORAPS_BULK_NOTHING_TO_DO
+            else:
+                status, message = completed[host_address]
+                message = ARBORAPS_JOURNAL_ALREADY_APPLIED if status == changed_status else message
+                resumed_hosts.add(host_address)
+                num_resumed += 1
+
+            counts[status] += 1
+            action_result.add_data({"ip": ip, "status": status, "message": message})
+
+        action_result.update_summary({**{f"num_{status}": count for status, count in counts.items()}, "num_resumed": num_resumed})
+
+        # Once every change is confirmed, a new run starts over
+        if all(status not in (None, ARBORAPS_BULK_STATUS_FAILED) for status, _ in entries.values()):
+            self._state.get(ARBORAPS_STATE_JOURNAL, {}).pop(journal_key, None)
+
+        if counts[ARBORAPS_BULK_STATUS_FAILED]:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_BULK_FAILED.format(counts[ARBORAPS_BULK_STATUS_FAILED], len(ips)))
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
-    def _handle_unblocklist_ip(self, param):
-        """This function is used to un-blocklist IP or CIDR.
+    def _format_invalid_ips(self, invalid):
+        """Function that returns the message of a sync or import refused because of invalid entries.
+
+        :param invalid: list of the (position, value) of the invalid entries, as returned by normalize_hosts
+        :return: message
+        """
+
+        return ARBORAPS_SYNC_INVALID_IPS.format(
+            ", ".join(ARBORAPS_INVALID_IP_POSITION.format(ip, entries) for ip, entries in _get_invalid_entries(invalid).items())
+        )
+
+    def _handle_sync_list(self, param):
+        """This function is used to make the blocklist or allowlist match the given set of IPs or CIDRs. Only the difference
+        between the list and the desired set is sent to the APS, missing entries are added before extra entries are removed.
 
         :param param: dictionary of input parameters
         :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
@@ -372,59 +2258,107 @@ class ArborApsConnector(BaseConnector):
         # Add an action result object to self (BaseConnector) to represent the action for this param
         action_result = self.add_action_result(ActionResult(dict(param)))
 
-        # Initiating login session
-        ret_val, _ = self._login(action_result)
+        list_name = ARBORAPS_SYNC_ACTIONS[self.get_action_identifier()]
+        dry_run = param.get(ARBORAPS_TA_PARAM_DRY_RUN, False)
+
+        ret_val, ips = self._get_ips_from_param(param, action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # Get required parameter
-        ip_address, net_mask = _break_ip_address(param[ARBORAPS_TA_PARAM_IP])
-        if net_mask != 32:
-            ip_address = param[ARBORAPS_TA_PARAM_IP]
+        # An invalid entry could remove a host that should stay on the list, so nothing is changed
+        host_addresses, invalid = normalize_hosts(ips)
+        if invalid:
+            return action_result.set_status(phantom.APP_ERROR, self._format_invalid_ips(invalid))
+
+        return self._sync_list(list_name, host_addresses, dry_run, action_result)
+
+    def _sync_list(self, list_name, host_addresses, dry_run, action_result):
+        """Function that makes the blocklist or allowlist match the given set of host addresses and adds the planned or
+        applied changes to the action result.
 
-        # Prepare endpoint
-        endpoint = f"{ARBORAPS_TA_REST_BLOCKLISTED_HOSTS}{ip_address}/"
-        self.save_progress(f"endpoint: {endpoint}")
+        :param list_name: blocklist/allowlist
+        :param host_addresses: iterable of host addresses, as returned by _get_host_address
+        :param dry_run: only plan the changes
+        :param action_result: object of Action Result
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
 
-        # Get blocklisted hosts
-        ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result)
+        # Initiating login session
+        ret_val, _ = self._login(action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # If IP is not present in blocklist
-        if not response:
-            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_UNBLOCKLISTED)
-
-        # Prepare params
-        params = {"hostAddress": ip_address}
-
-        # Delete IP from blocklist
-        ret_val, response = self._make_rest_call(
-            endpoint=ARBORAPS_TA_REST_BLOCKLISTED_HOSTS, action_result=action_result, method="delete", params=params
-        )
+        list_addresses = []
+        ret_val, _ = self._get_list(list_name, action_result, lambda host: list_addresses.append(host["hostAddress"]), live=True)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_UNBLOCKLISTED_SUCCESSFULLY)
+        existing_hosts = _group_entry_addresses(list_addresses)
+        desired_hosts = dict.fromkeys(host_addresses)
 
-    def _handle_blocklist_ip(self, param):
-        """This function is used to blocklist IP or CIDR.
+        updates = [(host_address, True) for host_address in desired_hosts if host_address not in existing_hosts]
+        updates.extend((host_address, False) for host_address in existing_hosts if host_address not in desired_hosts)
+
+        summary = action_result.update_summary(
+            {
+                "dry_run": dry_run,
+                "num_to_add": sum(add for _, add in updates),
+                "num_to_remove": sum(not add for _, add in updates),
+                "num_unchanged": len(desired_hosts) - sum(add for _, add in updates),
+            }
+        )
+
+        if dry_run:
+            results = [(ARBORAPS_SYNC_STATUS_PLANNED, "")] * len(updates)
+        else:
+            # Additions go first, so that hosts moving to another entry (e.g. from an IP to its CIDR) stay covered
+            num_to_add = summary["num_to_add"]
+            results = self._apply_list_updates(list_name, updates[:num_to_add])
+            results.extend(self._apply_list_updates(list_name, updates[num_to_add:], existing_hosts))
+
+        for (host_address, add), (status, message) in zip(updates, results):
+            operation = ARBORAPS_SYNC_OPERATION_ADD if add else ARBORAPS_SYNC_OPERATION_REMOVE
+            action_result.add_data({"ip": host_address, "operation": operation, "status": status, "message": message})
+
+        num_failed = sum(status == ARBORAPS_BULK_STATUS_FAILED for status, _ in results)
+        summary["num_failed"] = num_failed
+
+        if num_failed:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_BULK_FAILED.format(num_failed, len(updates)))
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _handle_export_list(self, param):
+        """This function is used to export the blocklist or allowlist to a gzip compressed NDJSON or CSV file in the vault.
+        The list is always fetched from the APS, never from a list snapshot, and its entries are written to the file as the
+        list response is parsed, so the list is never held in memory.
 
         :param param: dictionary of input parameters
         :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
         """
 
+        import gzip
+        import uuid
+
+        import phantom.rules as ph_rules
+        from phantom.vault import Vault
+
         self.save_progress(f"In action handler for: {self.get_action_identifier()}")
 
         # Add an action result object to self (BaseConnector) to represent the action for this param
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        list_name = param[ARBORAPS_TA_PARAM_LIST]
+        file_format = param.get(ARBORAPS_TA_PARAM_FORMAT, ARBORAPS_EXPORT_FORMAT_NDJSON)
+        if file_format not in ARBORAPS_EXPORT_FORMATS:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_INVALID_EXPORT_FORMAT.format(", ".join(ARBORAPS_EXPORT_FORMATS)))
+
         # Initiating login session
         ret_val, _ = self._login(action_result)
 
@@ -432,51 +2366,96 @@ class ArborApsConnector(BaseConnector):
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # Get required parameter
-        ip_address, net_mask = _break_ip_address(param[ARBORAPS_TA_PARAM_IP])
-        if net_mask != 32:
-            ip_address = param[ARBORAPS_TA_PARAM_IP]
-
-        # Prepare endpoint
-        endpoint = f"{ARBORAPS_TA_REST_BLOCKLISTED_HOSTS}{ip_address}/"
-        self.save_progress(f"endpoint: {endpoint}")
+        file_name = ARBORAPS_EXPORT_FILE_NAME.format(list=list_name, time=time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()), format=file_format)
+        file_path = os.path.join(Vault.get_vault_tmp_dir(), f"{uuid.uuid4()}-{file_name}")
+        # The checksum is the one of the uncompressed rows, it doesn't depend on the compression
+        checksum = hashlib.sha256()
+        num_rows = 0
 
-        # Get blocklisted hosts
-        ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result)
+        try:
+            with gzip.open(file_path, "wt", encoding="utf-8", newline="") as export_file:
+
+                def write_row(row):
+                    export_file.write(row)
+                    checksum.update(row.encode())
+
+                if file_format == ARBORAPS_EXPORT_FORMAT_CSV:
+                    write_row(_format_csv_row(ARBORAPS_EXPORT_FIELDS))
+
+                def export_host(host):
+                    nonlocal num_rows
+                    num_rows += 1
+                    host = _add_update_time_iso({"hostAddress": host["hostAddress"], "updateTime": host.get("updateTime")})
+                    if file_format == ARBORAPS_EXPORT_FORMAT_CSV:
+                        write_row(_format_csv_row([host.get(field) for field in ARBORAPS_EXPORT_FIELDS]))
+                    else:
+                        write_row(json.dumps(host) + "\n")
+
+                # An audit export needs the list as it is now, not a snapshot of the list
+                ret_val, _ = self._fetch_list(list_name, action_result, export_host)
+        except OSError as e:
+            _remove_file(file_path)
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_EXPORT_FILE_ERROR.format(e))
 
         # Something went wrong
         if phantom.is_fail(ret_val):
+            _remove_file(file_path)
             return action_result.get_status()
 
-        # If IP already present in blocklist
-        if response:
-            # Add the response into the data section
-            date_time = datetime.datetime.utcfromtimestamp(response["updateTime"])
-            response["updatetimeISO"] = date_time.isoformat() + "Z"
-            action_result.add_data(response)
-            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_BLOCKLISTED)
+        success, message, vault_id = ph_rules.vault_add(container=self.get_container_id(), file_location=file_path, file_name=file_name)
 
-        # Prepare params
-        params = {"hostAddress": ip_address}
+        # Something went wrong
+        if not success:
+            _remove_file(file_path)
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_EXPORT_FILE_ERROR.format(message))
 
-        # Add IP in blocklist
-        ret_val, response = self._make_rest_call(
-            endpoint=ARBORAPS_TA_REST_BLOCKLISTED_HOSTS, action_result=action_result, method="post", params=params
-        )
+        action_result.add_data({"vault_id": vault_id, "file_name": file_name, "num_rows": num_rows, "sha256": checksum.hexdigest()})
+        action_result.update_summary({"vault_id": vault_id, "num_rows": num_rows})
 
-        # Something went wrong
-        if phantom.is_fail(ret_val):
-            return action_result.get_status()
+        return action_result.set_status(phantom.APP_SUCCESS)
 
-        # Add the response into the data section
-        date_time = datetime.datetime.utcfromtimestamp(response["updateTime"])
-        response["updatetimeISO"] = date_time.isoformat() + "Z"
-        action_result.add_data(response)
+    def _handle_import_list(self, param):
+        """This function is used to make the blocklist or allowlist match a file of the vault, as exported by the export
+        list action. Only the host addresses of the file are kept in memory.
 
-        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_BLOCKLISTED_SUCCESSFULLY)
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
 
-    def _handle_unallowlist_ip(self, param):
-        """This function is used to un-allowlist IP or CIDR.
+        import phantom.rules as ph_rules
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        # Add an action result object to self (BaseConnector) to represent the action for this param
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        list_name = param[ARBORAPS_TA_PARAM_LIST]
+        vault_id = param[ARBORAPS_TA_PARAM_VAULT_ID]
+
+        success, message, vault_info = ph_rules.vault_info(vault_id=vault_id)
+        vault_info = list(vault_info or [])
+
+        if not success or not vault_info:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_VAULT_FILE_ERROR.format(vault_id, message))
+
+        try:
+            ips = list(_iter_list_file(vault_info[0]["path"]))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_VAULT_FILE_ERROR.format(vault_id, e))
+
+        # An invalid entry could remove a host that should stay on the list, so nothing is changed
+        host_addresses, invalid = normalize_hosts(ips)
+        if invalid:
+            return action_result.set_status(phantom.APP_ERROR, self._format_invalid_ips(invalid))
+
+        return self._sync_list(list_name, host_addresses, param.get(ARBORAPS_TA_PARAM_DRY_RUN, False), action_result)
+
+    def _handle_optimize_blocklist(self, param):
+        """This function is used to replace the entries of the blocklist by the smallest set of CIDRs covering exactly the
+        same addresses, e.g. adjacent IPs are merged into a CIDR and entries inside a wider entry are dropped. The new
+        entries are added before any old entry is removed, so that no address is ever left unblocked, and an old entry
+        whose replacing CIDR could not be added is kept on the list and reported as skipped. The entries of a block with a
+        'ttl' are left as they are, so that they are still removed when their block expires.
 
         :param param: dictionary of input parameters
         :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
@@ -487,6 +2466,8 @@ class ArborApsConnector(BaseConnector):
         # Add an action result object to self (BaseConnector) to represent the action for this param
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        apply_changes = param.get(ARBORAPS_TA_PARAM_APPLY, False)
+
         # Initiating login session
         ret_val, _ = self._login(action_result)
 
@@ -494,42 +2475,85 @@ class ArborApsConnector(BaseConnector):
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # Get required parameter
-        ip_address, net_mask = _break_ip_address(param[ARBORAPS_TA_PARAM_IP])
-        if net_mask != 32:
-            ip_address = param[ARBORAPS_TA_PARAM_IP]
+        networks = {}
+        expiring_hosts = self._get_block_expiries()
+
+        def add_host(host):
+            if _get_host_address(host["hostAddress"]) in expiring_hosts:
+                return
 
-        # Prepare endpoint
-        endpoint = f"{ARBORAPS_TA_REST_ALLOWLISTED_HOSTS}{ip_address}/"
-        self.save_progress(f"endpoint: {endpoint}")
+            try:
+                networks[host["hostAddress"]] = ipaddress.ip_network(host["hostAddress"], strict=False)
+            except ValueError:
+                # Entries we do not understand are left alone
+                self.debug_print(ARBORAPS_INVALID_LIST_ENTRY.format(host["hostAddress"]))
 
-        # Get allowlisted hosts
-        ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result)
+        ret_val, num_hosts = self._get_list(ARBORAPS_LIST_BLOCKLIST, action_result, add_host, live=True)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # If IP is not present in allowlist
-        if not response:
-            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_UNALLOWLISTED)
-
-        # Prepare params
-        params = {"hostAddress": ip_address}
-
-        # Delete IP from allowlist
-        ret_val, response = self._make_rest_call(
-            endpoint=ARBORAPS_TA_REST_ALLOWLISTED_HOSTS, action_result=action_result, method="delete", params=params
+        # collapse_addresses only merges networks of the same IP version
+        optimized_index = NetworkIndex()
+        optimized_hosts = []
+        for version in (4, 6):
+            for network in ipaddress.collapse_addresses(network for network in networks.values() if network.version == version):
+                host_address = _get_host_address(str(network))
+                optimized_index.add(network, host_address)
+                optimized_hosts.append(host_address)
+
+        # The entries are compared in their canonical form, an entry written differently is not replaced by itself
+        canonical_hosts = {_get_host_address(host_address) for host_address in networks}
+        updates = [(host_address, True) for host_address in optimized_hosts if host_address not in canonical_hosts]
+        num_to_add = len(updates)
+        optimized_host_set = set(optimized_hosts)
+        updates.extend((host_address, False) for host_address in networks if _get_host_address(host_address) not in optimized_host_set)
+
+        summary = action_result.update_summary(
+            {
+                "apply": apply_changes,
+                "num_entries": num_hosts,
+                "num_optimized_entries": num_hosts - len(networks) + len(optimized_hosts),
+                "num_to_add": num_to_add,
+                "num_to_remove": len(updates) - num_to_add,
+            }
         )
 
-        # Something went wrong
-        if phantom.is_fail(ret_val):
-            return action_result.get_status()
+        if not apply_changes:
+            results = [(ARBORAPS_SYNC_STATUS_PLANNED, "")] * len(updates)
+        else:
+            results = self._apply_list_updates(ARBORAPS_LIST_BLOCKLIST, updates[:num_to_add])
+            failed_hosts = {host_address for (host_address, _), (status, _) in zip(updates, results) if status == ARBORAPS_BULK_STATUS_FAILED}
+
+            # Only remove the entries whose replacing CIDR has been added
+            removals = [
+                (host_address, False)
+                for host_address, _ in updates[num_to_add:]
+                if optimized_index.covering(networks[host_address])[0] not in failed_hosts
+            ]
+            removal_results = dict(
+                zip((host_address for host_address, _ in removals), self._apply_list_updates(ARBORAPS_LIST_BLOCKLIST, removals))
+            )
+            results.extend(
+                removal_results.get(host_address, (ARBORAPS_BULK_STATUS_SKIPPED, ARBORAPS_OPTIMIZE_NOT_REMOVED))
+                for host_address, _ in updates[num_to_add:]
+            )
+
+        for (host_address, add), (status, message) in zip(updates, results):
+            operation = ARBORAPS_SYNC_OPERATION_ADD if add else ARBORAPS_SYNC_OPERATION_REMOVE
+            action_result.add_data({"ip": host_address, "operation": operation, "status": status, "message": message})
+
+        num_failed = sum(status == ARBORAPS_BULK_STATUS_FAILED for status, _ in results)
+        summary["num_failed"] = num_failed
+
+        if num_failed:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_BULK_FAILED.format(num_failed, len(updates)))
 
-        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_UNALLOWLISTED_SUCCESSFULLY)
+        return action_result.set_status(phantom.APP_SUCCESS)
 
-    def _handle_allowlist_ip(self, param):
-        """This function is used to allowlist IP or CIDR.
+    def _handle_lookup_ip(self, param):
+        """This function is used to find the entries of the blocklist or allowlist covering an IP or CIDR.
 
         :param param: dictionary of input parameters
         :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
@@ -540,55 +2564,312 @@ class ArborApsConnector(BaseConnector):
         # Add an action result object to self (BaseConnector) to represent the action for this param
         action_result = self.add_action_result(ActionResult(dict(param)))
 
-        # Initiating login session
-        ret_val, _ = self._login(action_result)
+        # The index is shared by all the params of the run
+        ret_val, index = self._get_list_index(param.get(ARBORAPS_TA_PARAM_LIST, ARBORAPS_LIST_BLOCKLIST), action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
             return action_result.get_status()
 
-        # Get required parameter
-        ip_address, net_mask = _break_ip_address(param[ARBORAPS_TA_PARAM_IP])
-        if net_mask != 32:
-            ip_address = param[ARBORAPS_TA_PARAM_IP]
+        covering_hosts = index.covering(param[ARBORAPS_TA_PARAM_IP])
+        for host in covering_hosts:
+            action_result.add_data(_add_update_time_iso(dict(host)))
+
+        action_result.update_summary({"is_covered": bool(covering_hosts), "num_entries": len(covering_hosts)})
 
-        # Prepare endpoint
-        endpoint = f"{ARBORAPS_TA_REST_ALLOWLISTED_HOSTS}{ip_address}/"
-        self.save_progress(f"endpoint: {endpoint}")
+        return action_result.set_status(phantom.APP_SUCCESS)
 
-        # Get allowlisted hosts
-        ret_val, response = self._make_rest_call(endpoint=endpoint, action_result=action_result)
+    def _sweep_expired_blocks(self, action_result):
+        """Function that removes the IPs whose block has expired from the blocklist, all of them in one pass. The IPs
+        that could not be removed are kept for the next poll.
 
-        # Something went wrong
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        expired = self._pop_expired_blocks()
+        self.save_progress(ARBORAPS_EXPIRED_BLOCKS_MSG.format(len(expired)))
+        summary = action_result.update_summary({"num_expired": len(expired), "num_removed": 0, "num_failed": 0})
+
+        if not expired:
+            return phantom.APP_SUCCESS
+
+        ret_val, _ = self._login(action_result)
+
+        # Get the current entries of the blocklist once, the expired IPs that are no longer on it need no change
+        list_addresses = []
+        if phantom.is_success(ret_val):
+            ret_val, _ = self._get_list(
+                ARBORAPS_LIST_BLOCKLIST, action_result, lambda host: list_addresses.append(host["hostAddress"]), live=True
+            )
+
+        # Something went wrong, try again on the next poll
         if phantom.is_fail(ret_val):
+            self._restore_block_expiries(expired)
             return action_result.get_status()
 
-        # If IP already present in allowlist
-        if response:
-            # Add the response into the data section
-            date_time = datetime.datetime.utcfromtimestamp(response["updateTime"])
-            response["updatetimeISO"] = date_time.isoformat() + "Z"
-            action_result.add_data(response)
-            return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALREADY_ALLOWLISTED)
+        existing_hosts = _group_entry_addresses(list_addresses)
+        updates = [(host_address, False) for host_address in expired if host_address in existing_hosts]
 
-        # Prepare params
-        params = {"hostAddress": ip_address}
+        failed = {}
+        for (host_address, _), (status, message) in zip(updates, self._apply_list_updates(ARBORAPS_LIST_BLOCKLIST, updates, existing_hosts)):
+            if status == ARBORAPS_BULK_STATUS_FAILED:
+                self.debug_print(ARBORAPS_EXPIRED_BLOCK_REMOVE_ERROR.format(host_address, message))
+                failed[host_address] = expired[host_address]
+                summary["num_failed"] += 1
+            else:
+                summary["num_removed"] += 1
 
-        # Add IP in allowlist
-        ret_val, response = self._make_rest_call(
-            endpoint=ARBORAPS_TA_REST_ALLOWLISTED_HOSTS, action_result=action_result, method="post", params=params
-        )
+        self._restore_block_expiries(failed)
+
+        if summary["num_failed"]:
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_BULK_FAILED.format(summary["num_failed"], len(updates)))
+
+        return phantom.APP_SUCCESS
+
+    def _fetch_list_for_poll(self, list_name, snapshot):
+        """Function that fetches the entries of a list for the poll. The entries seen by the previous poll are kept in the
+        poll file of the device and the request is conditional, so that a poll with no changes costs a single request
+        with an empty response, if the APS supports it.
+
+        :param list_name: blocklist/allowlist
+        :param snapshot: snapshot of the list kept by the previous poll, None if there is none
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS, error message, dictionary of {host address: update time},
+        response headers (None if the list has not changed since the previous poll)
+        """
+
+        # Only initializing action_result for REST calls, not adding it to BaseConnector
+        action_result = ActionResult()
+        hosts = {}
+
+        def add_host(host):
+            hosts[host["hostAddress"]] = host.get("updateTime")
+
+        ret_val, response_headers = self._fetch_list(list_name, action_result, add_host, snapshot)
+
+        return ret_val, action_result.get_message(), hosts, response_headers
+
+    def _ingest_list_changes(self, list_name, previous, hosts, response_headers, action_result):
+        """Function that creates a container with one artifact per entry added to, removed from or updated on the list
+        since the previous poll. The first poll only records the entries, and the changes made by the actions of this app
+        are not reported. The actions of the asset keep changing the snapshot of the poller while the list is fetched, so
+        the new snapshot is written under the lock of the poll file, along with the changes they made since.
+
+        :param list_name: blocklist/allowlist
+        :param previous: snapshot of the list read before the list was fetched, None if there is none
+        :param hosts: dictionary of {host address: update time} of the entries of the list, as fetched by
+        _fetch_list_for_poll
+        :param response_headers: response headers of the list (None if the list has not changed since the previous poll)
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), number of changes by type
+        """
+
+        counts = dict.fromkeys(ARBORAPS_LIST_CHANGES, 0)
+
+        # The list has not changed since the previous poll
+        if response_headers is None:
+            return RetVal(phantom.APP_SUCCESS, counts)
+
+        changes = []
+        if previous is not None:
+            previous_hosts = previous["hosts"]
+
+            # The entries changed by the actions of this app since the snapshot was read are not reported
+            with self._poll_snapshots.open() as snapshots:
+                changed_hosts = _get_changed_hosts(previous_hosts, (snapshots.get(list_name) or previous)["hosts"])
+
+            for host_address, update_time in hosts.items():
+                if host_address in changed_hosts:
+                    continue
+                if host_address not in previous_hosts:
+                    changes.append((ARBORAPS_LIST_CHANGE_ADDED, host_address, update_time))
+                # The update time of the hosts added by this app is not always known
+                elif previous_hosts[host_address] not in (None, update_time):
+                    changes.append((ARBORAPS_LIST_CHANGE_UPDATED, host_address, update_time))
+            changes.extend(
+                (ARBORAPS_LIST_CHANGE_REMOVED, host_address, update_time)
+                for host_address, update_time in previous_hosts.items()
+                if host_address not in hosts and host_address not in changed_hosts
+            )
+
+        if changes:
+            ret_val = self._save_list_changes(list_name, changes, action_result)
+
+            # Something went wrong, the changes will be reported by the next poll
+            if phantom.is_fail(ret_val):
+                return RetVal(action_result.get_status(), counts)
+
+        for change, _, _ in changes:
+            counts[change] += 1
+
+        with self._poll_snapshots.open() as snapshots:
+            current = snapshots.get(list_name)
+
+            # Keep the changes made by the actions of this app since the snapshot was read
+            if previous is not None and current is not None:
+                for host_address in _get_changed_hosts(previous["hosts"], current["hosts"]):
+                    if host_address in current["hosts"]:
+                        hosts[host_address] = current["hosts"][host_address]
+                    else:
+                        hosts.pop(host_address, None)
+
+            snapshots[list_name] = {"etag": response_headers.get("ETag"), "last_modified": response_headers.get("Last-Modified"), "hosts": hosts}
+
+        return RetVal(phantom.APP_SUCCESS, counts)
+
+    def _save_list_changes(self, list_name, changes, action_result):
+        """Function that saves the changes of a list as a container with one artifact per changed entry.
+
+        :param list_name: blocklist/allowlist
+        :param changes: list of (change, host address, update time) tuples
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        list_title = list_name.capitalize()
+        poll_time = datetime.datetime.utcnow().isoformat() + "Z"
+        label = self.get_config().get("ingest", {}).get("container_label")
+
+        container = {
+            "name": ARBORAPS_POLL_CONTAINER_NAME.format(list=list_title, num_changes=len(changes), time=poll_time),
+            "description": ARBORAPS_POLL_CONTAINER_DESCRIPTION.format(list=list_title, server_url=self._server_url),
+            "source_data_identifier": f"{self._server_url}-{list_name}-{poll_time}",
+            "label": label,
+        }
+
+        ret_val, message, container_id = self.save_container(container)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_POLL_SAVE_ERROR.format(list_title, message))
+
+        artifacts = []
+        for change, host_address, update_time in changes:
+            artifacts.append(
+                {
+                    "name": ARBORAPS_POLL_ARTIFACT_NAME.format(list=list_title, change=change),
+                    "container_id": container_id,
+                    "label": label,
+                    "source_data_identifier": f"{list_name}-{change}-{host_address}-{update_time}",
+                    "cef": _add_update_time_iso({"hostAddress": host_address, "list": list_name, "change": change, "updateTime": update_time}),
+                    "cef_types": {"hostAddress": ["ip"]},
+                    "run_automation": False,
+                }
+            )
+
+        # Run the playbooks once, when the last artifact is saved
+        artifacts[-1]["run_automation"] = True
+
+        ret_val, message, _ = self.save_artifacts(artifacts)
+
+        # Something went wrong
+        if phantom.is_fail(ret_val):
+            return action_result.set_status(phantom.APP_ERROR, ARBORAPS_POLL_SAVE_ERROR.format(list_title, message))
+
+        return phantom.APP_SUCCESS
+
+    def _poll_device(self, param):
+        """Function that removes the IPs whose block has expired from the blocklist of the current device and, if the
+        ingestion is enabled, fetches its lists for the poll.
+
+        :param param: dictionary of input parameters
+        :return: object of Action Result, message of the failed sweep (None if it succeeded), list of (list name,
+        snapshot of the list read before it was fetched, result of _fetch_list_for_poll) tuples (None if the login failed)
+        """
+
+        action_result = ActionResult(dict(param))
+
+        ret_val = self._sweep_expired_blocks(action_result)
+        sweep_error = None if phantom.is_success(ret_val) else action_result.get_message()
+
+        if not self._ingest_list_changes_enabled:
+            return action_result, sweep_error, []
+
+        action_result.update_summary({f"num_entries_{change}": 0 for change in ARBORAPS_LIST_CHANGES})
+
+        # Initiating login session
+        ret_val, _ = self._login(action_result)
 
         # Something went wrong
         if phantom.is_fail(ret_val):
+            return action_result, sweep_error, None
+
+        with self._poll_snapshots.open() as snapshots:
+            previous = {list_name: snapshots.get(list_name) for list_name in ARBORAPS_LIST_ENDPOINTS}
+
+        # The lists are independent, they are fetched at the same time
+        results = self._run_concurrently(lambda list_name: self._fetch_list_for_poll(list_name, previous[list_name]), list(previous))
+
+        return action_result, sweep_error, [(list_name, previous[list_name], result) for list_name, result in zip(previous, results)]
+
+    def _ingest_poll(self, action_result, sweep_error, fetched_lists):
+        """Function that ingests the changes of the lists fetched by _poll_device for the current device.
+
+        :param action_result: object of Action Result returned by _poll_device
+        :param sweep_error: message of the failed sweep (None if it succeeded)
+        :param fetched_lists: list of (list name, snapshot, result of _fetch_list_for_poll) tuples (None if the login failed)
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        # The login failed
+        if fetched_lists is None:
             return action_result.get_status()
 
-        # Add the response into the data section
-        date_time = datetime.datetime.utcfromtimestamp(response["updateTime"])
-        response["updatetimeISO"] = date_time.isoformat() + "Z"
-        action_result.add_data(response)
+        summary = action_result.get_summary()
 
-        return action_result.set_status(phantom.APP_SUCCESS, ARBORAPS_ALLOWLISTED_SUCCESSFULLY)
+        for list_name, previous, (ret_val, message, hosts, response_headers) in fetched_lists:
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.set_status(phantom.APP_ERROR, message)
+
+            ret_val, counts = self._ingest_list_changes(list_name, previous, hosts, response_headers, action_result)
+
+            # Something went wrong
+            if phantom.is_fail(ret_val):
+                return action_result.get_status()
+
+            self.save_progress(ARBORAPS_POLL_CHANGES_MSG.format(list=list_name.capitalize(), **counts))
+            for change, count in counts.items():
+                summary[f"num_entries_{change}"] += count
+
+        # The expired blocks that could not be removed are retried on the next poll
+        if sweep_error is not None:
+            return action_result.set_status(phantom.APP_ERROR, sweep_error)
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _handle_on_poll(self, param):
+        """This function is used to remove the IPs whose block has expired from the blocklist and, if enabled, to ingest
+        the changes of the blocklist and allowlist since the previous poll, on every APS device of the asset. The devices
+        are swept and their lists fetched concurrently, their changes are ingested from the calling thread one device
+        after the other, since nothing guarantees that save_container and save_artifacts can be called from worker
+        threads.
+
+        :param param: dictionary of input parameters
+        :return: status phantom.APP_SUCCESS/phantom.APP_ERROR (along with appropriate message)
+        """
+
+        self.save_progress(f"In action handler for: {self.get_action_identifier()}")
+
+        polls = self._run_on_devices(lambda device: self._poll_device(param))
+
+        ret_vals = []
+        for device, (action_result, sweep_error, fetched_lists) in zip(self._devices, polls):
+            self._local.device = device
+            try:
+                ret_vals.append(self._ingest_poll(action_result, sweep_error, fetched_lists))
+            finally:
+                self._local.device = None
+
+            # Each device has its own action result, which tells the device in its summary
+            if len(self._devices) > 1:
+                action_result.update_summary({"server_url": device.server_url})
+            self.add_action_result(action_result)
+
+        if all(phantom.is_success(ret_val) for ret_val in ret_vals):
+            return phantom.APP_SUCCESS
+
+        return phantom.APP_ERROR
 
     def handle_action(self, param):
         """This function gets current action identifier and calls member function of its own to handle the action.
@@ -605,6 +2886,17 @@ class ArborApsConnector(BaseConnector):
             "unblock_ip": self._handle_unblocklist_ip,
             "allow_ip": self._handle_allowlist_ip,
             "unallow_ip": self._handle_unallowlist_ip,
+            "block_ips": self._handle_bulk_update,
+            "unblock_ips": self._handle_bulk_update,
+            "allow_ips": self._handle_bulk_update,
+            "unallow_ips": self._handle_bulk_update,
+            "sync_blocklist": self._handle_sync_list,
+            "sync_allowlist": self._handle_sync_list,
+            "lookup_ip": self._handle_lookup_ip,
+            "optimize_blocklist": self._handle_optimize_blocklist,
+            "export_list": self._handle_export_list,
+            "import_list": self._handle_import_list,
+            "on_poll": self._handle_on_poll,
         }
 
         action = self.get_action_identifier()
@@ -612,10 +2904,43 @@ class ArborApsConnector(BaseConnector):
 
         if action in list(action_mapping.keys()):
             action_function = action_mapping[action]
-            action_execution_status = action_function(param)
+            self._metrics = Metrics()
+            for device in self._devices:
+                device.session.param_logged_in = False
+            self._deadline = time.monotonic() + self._action_timeout if self._action_timeout else None
+
+            if action in ARBORAPS_COALESCED_ACTIONS:
+                action_function = functools.partial(self._handle_coalesced, action_function)
+
+            with self._metrics.timer(f"action {action}"):
+                if len(self._devices) > 1 and action in ARBORAPS_FAN_OUT_ACTIONS:
+                    action_execution_status = self._fan_out(action_function, param)
+                else:
+                    action_execution_status = action_function(param)
+
+            self._run_metrics.update(self._metrics)
+            if self._include_metrics and self.get_action_results():
+                self.get_action_results()[-1].update_summary({"metrics": self._metrics.summary()})
 
         return action_execution_status
 
+    def _write_metrics_file(self):
+        """Function that appends the metrics of the action run to the configured JSON lines file."""
+
+        record = {
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "asset_id": self.get_asset_id(),
+            "action": self.get_action_identifier(),
+            "metrics": self._run_metrics.summary(),
+        }
+
+        try:
+            with open(self._metrics_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            # Metrics must never fail the action
+            self.debug_print(ARBORAPS_METRICS_FILE_ERROR.format(self._metrics_file, e))
+
     def finalize(self):
         """This function gets called once all the param dictionary elements are looped over and no more handle_action
         calls are left to be made. It gives the AppConnector a chance to loop through all the results that were
@@ -625,7 +2950,37 @@ class ArborApsConnector(BaseConnector):
         :return: status (success/failure)
         """
 
-        return self._logout()
+        # Calls made from here on belong to the action run as a whole
+        self._metrics = self._run_metrics
+
+        def logout_device(device):
+            # A cached session is left open for the next action run, unless configured otherwise
+            keep_session = ARBORAPS_STATE_SESSION in self._state and not self._logout_cached_session
+
+            # Only log out if a param actually logged in
+            if not device.session.authenticated or keep_session:
+                return phantom.APP_SUCCESS
+
+            self._state.pop(ARBORAPS_STATE_SESSION, None)
+            return self._logout()
+
+        results = self._run_on_devices(logout_device)
+        ret_val = phantom.APP_SUCCESS if all(phantom.is_success(result) for result in results) else phantom.APP_ERROR
+
+        login_count = sum(device.session.login_count for device in self._devices)
+        reuse_count = sum(device.session.reuse_count for device in self._devices)
+        if login_count or reuse_count:
+            self.save_progress(ARBORAPS_SESSION_REUSE_MSG.format(login_count=login_count, saved=reuse_count))
+
+        if self._metrics_file:
+            self._write_metrics_file()
+
+        for device in self._devices:
+            device.session.close()
+
+        self.save_state(self._root_state)
+
+        return ret_val
 
 
 if __name__ == "__main__":
@@ -13,18 +13,59 @@
 # either express or implied. See the License for the specific language governing permissions
 # and limitations under the License.
 ARBORAPS_TA_CONFIG_SERVER_URL = "server_url"
+ARBORAPS_TA_CONFIG_ADDITIONAL_SERVER_URLS = "additional_server_urls"
 ARBORAPS_TA_CONFIG_USERNAME = "username"
 ARBORAPS_TA_CONFIG_PASSWORD = "password"  # pragma: allowlist secret
 ARBORAPS_TA_CONFIG_VERIFY_SSL = "verify_server_cert"
+ARBORAPS_TA_CONFIG_SESSION_CACHE_TTL = "session_cache_ttl"
+ARBORAPS_TA_CONFIG_LOGOUT_CACHED_SESSION = "logout_cached_session"
+ARBORAPS_TA_CONFIG_LIST_CACHE_TTL = "list_cache_ttl"
+ARBORAPS_TA_CONFIG_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+ARBORAPS_TA_CONFIG_CONNECT_TIMEOUT = "connect_timeout"
+ARBORAPS_TA_CONFIG_READ_TIMEOUT = "read_timeout"
+ARBORAPS_TA_CONFIG_JOURNAL_TTL = "journal_ttl"
+ARBORAPS_TA_CONFIG_INGEST_LIST_CHANGES = "ingest_list_changes"
+ARBORAPS_TA_CONFIG_INCLUDE_METRICS = "include_metrics"
+ARBORAPS_TA_CONFIG_METRICS_FILE = "metrics_file"
+ARBORAPS_TA_CONFIG_MAX_REQUESTS_PER_SECOND = "max_requests_per_second"
+ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_THRESHOLD = "circuit_breaker_threshold"
+ARBORAPS_TA_CONFIG_CIRCUIT_BREAKER_COOLDOWN = "circuit_breaker_cooldown"
+ARBORAPS_TA_CONFIG_ACTION_TIMEOUT = "action_timeout"
+ARBORAPS_DEFAULT_MAX_CONCURRENT_REQUESTS = 5
+ARBORAPS_DEFAULT_CONNECT_TIMEOUT = 10
+ARBORAPS_DEFAULT_READ_TIMEOUT = 60
+ARBORAPS_DEFAULT_JOURNAL_TTL = 86400
+ARBORAPS_DEFAULT_CIRCUIT_BREAKER_COOLDOWN = 60
 ARBORAPS_TA_CONNECTION_TEST_MSG = "Querying endpoint to verify the credentials provided"
 ARBORAPS_TA_REST_LOGIN = "/platform/login"
 ARBORAPS_TA_REST_LOGOUT = "/platform/logout"
 ARBORAPS_TEST_CONNECTIVITY_FAIL = "Test Connectivity Failed."
 ARBORAPS_TEST_CONNECTIVITY_PASS = "Test Connectivity Passed"
 ARBORAPS_TA_PARAM_IP = "ip"
+ARBORAPS_TA_PARAM_IPS = "ips"
+ARBORAPS_TA_PARAM_VAULT_ID = "vault_id"
+ARBORAPS_TA_PARAM_LIST = "list"
+ARBORAPS_TA_PARAM_DRY_RUN = "dry_run"
+ARBORAPS_TA_PARAM_LIMIT = "limit"
+ARBORAPS_TA_PARAM_OFFSET = "offset"
+ARBORAPS_TA_PARAM_FILTER = "filter"
+ARBORAPS_TA_PARAM_SKIP_COVERED = "skip_covered"
+ARBORAPS_TA_PARAM_APPLY = "apply"
+ARBORAPS_TA_PARAM_TTL = "ttl"
+ARBORAPS_TA_PARAM_COMPACT = "compact"
+ARBORAPS_TA_PARAM_FORMAT = "format"
 ARBORAPS_TA_REST_BLOCKLISTED_HOSTS = "/api/aps/v1/otf/blacklisted-hosts/"
 ARBORAPS_TA_REST_ALLOWLISTED_HOSTS = "/api/aps/v1/otf/whitelisted-hosts/"
+ARBORAPS_LIST_BLOCKLIST = "blocklist"
+ARBORAPS_LIST_ALLOWLIST = "allowlist"
+ARBORAPS_LIST_ENDPOINTS = {
+    ARBORAPS_LIST_BLOCKLIST: ARBORAPS_TA_REST_BLOCKLISTED_HOSTS,
+    ARBORAPS_LIST_ALLOWLIST: ARBORAPS_TA_REST_ALLOWLISTED_HOSTS,
+}
+ARBORAPS_LIST_RESPONSE_KEYS = {ARBORAPS_LIST_BLOCKLIST: "blacklisted-hosts", ARBORAPS_LIST_ALLOWLIST: "whitelisted-hosts"}
 ARBORAPS_INVALID_IP = "Parameter 'ip' failed validation"
+ARBORAPS_INVALID_IP_ENTRY = "Invalid IP or CIDR (entry {} of the input)"
+ARBORAPS_INVALID_IP_POSITION = "{} (entry {})"
 ARBORAPS_ALREADY_BLOCKLISTED = "IP already in blocklist"
 ARBORAPS_ALREADY_ALLOWLISTED = "IP already in allowlist"
 ARBORAPS_BLOCKLISTED_SUCCESSFULLY = "IP blocklisted successfully"
@@ -33,3 +74,90 @@ ARBORAPS_ALREADY_UNBLOCKLISTED = "IP already un-blockisted"
 ARBORAPS_ALREADY_UNALLOWLISTED = "IP already un-allowlisted"
 ARBORAPS_UNBLOCKLISTED_SUCCESSFULLY = "IP un-blocklisted successfully"
 ARBORAPS_UNALLOWLISTED_SUCCESSFULLY = "IP un-allowlisted successfully"
+ARBORAPS_SESSION_EXPIRED_STATUS_CODES = (401, 403)
+ARBORAPS_SESSION_EXPIRED = "APS session expired, logging in again"
+ARBORAPS_SESSION_REUSE_MSG = "Logged in to APS {login_count} time(s), {saved} login(s) saved by reusing the session"
+ARBORAPS_STATE_SESSION = "session"
+ARBORAPS_STATE_LIST_CACHE = "list_cache"
+ARBORAPS_STATE_JOURNAL = "journal"
+ARBORAPS_STATE_DEVICES = "devices"
+ARBORAPS_INVALID_INTEGER = "Please provide a valid integer value in the '{key}' parameter"
+ARBORAPS_SESSION_CACHE_DECRYPT_ERROR = "Unable to decrypt the cached APS session, a new login will be performed"
+ARBORAPS_BULK_ACTIONS = {
+    "block_ips": (ARBORAPS_LIST_BLOCKLIST, True),
+    "unblock_ips": (ARBORAPS_LIST_BLOCKLIST, False),
+    "allow_ips": (ARBORAPS_LIST_ALLOWLIST, True),
+    "unallow_ips": (ARBORAPS_LIST_ALLOWLIST, False),
+}
+ARBORAPS_BULK_STATUS_ADDED = "added"
+ARBORAPS_BULK_STATUS_REMOVED = "removed"
+ARBORAPS_BULK_STATUS_SKIPPED = "skipped"
+ARBORAPS_BULK_STATUS_FAILED = "failed"
+ARBORAPS_BULK_NOTHING_TO_DO = "List already up to date for this IP"
+ARBORAPS_BULK_FAILED = "Failed to update {} of {} IPs"
+ARBORAPS_IP_LIST_SEPARATORS = r"[,\s]+"
+ARBORAPS_NO_IPS_PROVIDED = "Please provide at least one IP in the 'ips' parameter or a vault file in the 'vault_id' parameter"
+ARBORAPS_VAULT_FILE_ERROR = "Unable to read the vault file with vault ID '{}'. Details: {}"
+ARBORAPS_THROTTLE_STATUS_CODES = (429, 503)
+ARBORAPS_THROTTLE_MAX_RETRIES = 5
+ARBORAPS_THROTTLE_BACKOFF_FACTOR = 0.5
+ARBORAPS_THROTTLE_MAX_DELAY = 30
+ARBORAPS_THROTTLED_MSG = "APS responded with status code {status_code}, retrying in {delay} seconds"
+ARBORAPS_SYNC_ACTIONS = {"sync_blocklist": ARBORAPS_LIST_BLOCKLIST, "sync_allowlist": ARBORAPS_LIST_ALLOWLIST}
+ARBORAPS_SYNC_OPERATION_ADD = "add"
+ARBORAPS_SYNC_OPERATION_REMOVE = "remove"
+ARBORAPS_SYNC_STATUS_PLANNED = "planned"
+ARBORAPS_SYNC_INVALID_IPS = "The list was not changed because of invalid IPs or CIDRs: {}"
+ARBORAPS_INVALID_FILTER = "Please provide a valid IP or CIDR in the 'filter' parameter"
+ARBORAPS_STREAM_CHUNK_SIZE = 64 * 1024
+ARBORAPS_DEBUG_DATA_MAX_SIZE = 64 * 1024
+ARBORAPS_DEBUG_DATA_TRUNCATED = "Response body of {} bytes not stored"
+ARBORAPS_LIST_PARSE_ERROR = "Unable to parse the list response. Error: {}"
+ARBORAPS_LIST_FETCHED_MSG = "Fetched {} list entries"
+ARBORAPS_ALREADY_COVERED = "IP already covered by list entry {}"
+ARBORAPS_INVALID_LIST_ENTRY = "Skipping list entry with invalid host address: {}"
+ARBORAPS_OPTIMIZE_NOT_REMOVED = "Not removed because the CIDR replacing this entry could not be added"
+ARBORAPS_CONNECTION_MAX_RETRIES = 3
+ARBORAPS_CONNECTION_BACKOFF_FACTOR = 0.5
+ARBORAPS_TIMEOUT_ERROR = "Timed out waiting for the server. Details: {}"
+ARBORAPS_REST_CALL_TIMING = (
+    "{method} {endpoint} returned {status_code} in {total:.3f}s (response headers after {elapsed:.3f}s, attempt {attempt})"
+)
+ARBORAPS_METRICS_FILE_ERROR = "Unable to write the metrics to '{}'. Details: {}"
+ARBORAPS_JOURNAL_SAVE_INTERVAL = 100
+ARBORAPS_JOURNAL_ALREADY_APPLIED = "Applied by a previous run of this action"
+ARBORAPS_EXPIRED_BLOCKS_MSG = "Found {} IP(s) whose block has expired"
+ARBORAPS_EXPIRED_BLOCK_REMOVE_ERROR = "Unable to remove the expired block of {}, it will be retried on the next poll. Details: {}"
+ARBORAPS_LIST_CHANGE_ADDED = "added"
+ARBORAPS_LIST_CHANGE_REMOVED = "removed"
+ARBORAPS_LIST_CHANGE_UPDATED = "updated"
+ARBORAPS_LIST_CHANGES = (ARBORAPS_LIST_CHANGE_ADDED, ARBORAPS_LIST_CHANGE_REMOVED, ARBORAPS_LIST_CHANGE_UPDATED)
+ARBORAPS_POLL_CONTAINER_NAME = "APS {list} changes ({num_changes}) at {time}"
+ARBORAPS_POLL_CONTAINER_DESCRIPTION = "Entries of the {list} of the APS at {server_url} changed since the previous poll"
+ARBORAPS_POLL_ARTIFACT_NAME = "{list} entry {change}"
+ARBORAPS_POLL_SAVE_ERROR = "Unable to save the changes of the {}. Details: {}"
+ARBORAPS_POLL_CHANGES_MSG = "{list}: {added} added, {removed} removed, {updated} updated since the previous poll"
+ARBORAPS_FAN_OUT_ACTIONS = (
+    "test_connectivity",
+    "block_ip",
+    "unblock_ip",
+    "allow_ip",
+    "unallow_ip",
+    *ARBORAPS_BULK_ACTIONS,
+    *ARBORAPS_SYNC_ACTIONS,
+    "import_list",
+)
+ARBORAPS_COALESCED_ACTIONS = ("block_ip", "unblock_ip", "allow_ip", "unallow_ip")
+ARBORAPS_PARAM_COALESCED_MSG = "Reusing the result of an earlier param of this action run for {}"
+ARBORAPS_SHARED_STATE_FILE = "arboraps_{}_limits.json"
+ARBORAPS_EXPIRIES_FILE = "arboraps_{}_{}_expiries.json"
+ARBORAPS_POLL_FILE = "arboraps_{}_{}_poll.json"
+ARBORAPS_CIRCUIT_OPEN = "Not sending requests to the APS at {server_url} after {threshold} failed requests in a row, it will be probed again in {retry_in:.0f} seconds"
+ARBORAPS_EXPORT_FORMAT_NDJSON = "ndjson"
+ARBORAPS_EXPORT_FORMAT_CSV = "csv"
+ARBORAPS_EXPORT_FORMATS = (ARBORAPS_EXPORT_FORMAT_NDJSON, ARBORAPS_EXPORT_FORMAT_CSV)
+ARBORAPS_EXPORT_FIELDS = ("hostAddress", "updateTime", "updatetimeISO")
+ARBORAPS_EXPORT_FILE_NAME = "aps_{list}_{time}.{format}.gz"
+ARBORAPS_INVALID_EXPORT_FORMAT = "Please provide one of the following values in the 'format' parameter: {}"
+ARBORAPS_EXPORT_FILE_ERROR = "Unable to add the exported list to the vault. Details: {}"
+ARBORAPS_CHANGE_CANCELLED = "Cancelled before it was sent to the APS, the param exceeded the 'action_timeout' of {} seconds"
@@ -0,0 +1,487 @@
+# File: arboraps_utils.py
+#
+# Copyright (c) 2017-2026 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# Standard library imports
+import array
+import base64
+import bisect
+import collections
+import contextlib
+import functools
+import ipaddress
+import json
+import math
+import socket
+import threading
+import time
+
+
+# {version: (address family, max prefix length, {prefix length: mask of the network bits})}
+_IP_VERSIONS = {
+    version: (
+        family,
+        max_prefix_length,
+        [(1 << max_prefix_length) - (1 << (max_prefix_length - length)) for length in range(max_prefix_length + 1)],
+    )
+    for version, family, max_prefix_length in ((4, socket.AF_INET, 32), (6, socket.AF_INET6, 128))
+}
+
+# Number of values whose IPv4 fast path of normalize_hosts fails or succeeds as a whole
+_NORMALIZE_CHUNK_SIZE = 4096
+
+
+def parse_host(value):
+    """Parse an IP or CIDR into integer form, with the host bits of a CIDR cleared.
+
+    :param value: IP address in format of IP or IP/prefix_size, IPv4 or IPv6
+    :return: (version, network address as an integer, prefix length), or None if the value is not valid
+    """
+
+    address, slash, prefix = value.partition("/")
+    version = 6 if ":" in address else 4
+    family, max_prefix_length, masks = _IP_VERSIONS[version]
+
+    try:
+        network = int.from_bytes(socket.inet_pton(family, address), "big")
+    except OSError:
+        return None
+
+    if not slash:
+        return version, network, max_prefix_length
+
+    if not (prefix.isascii() and prefix.isdigit()) or int(prefix) > max_prefix_length:
+        return None
+
+    return version, network & masks[int(prefix)], int(prefix)
+
+
+def format_host(version, network, prefix_length):
+    """Return the canonical host address of a network: the compressed network address, followed by the prefix length
+    unless the network is a single IP.
+
+    :param version: 4/6
+    :param network: network address as an integer
+    :param prefix_length: prefix length
+    :return: host address
+    """
+
+    family, max_prefix_length, _ = _IP_VERSIONS[version]
+    address = socket.inet_ntop(family, network.to_bytes(max_prefix_length // 8, "big"))
+
+    # inet_ntop writes the IPv6 addresses embedding an IPv4 address differently than ipaddress
+    if "." in address and version == 6:
+        address = ipaddress.IPv6Address(network).compressed
+
+    if prefix_length == max_prefix_length:
+        return address
+
+    return f"{address}/{prefix_length}"
+
+
+def normalize_host(value):
+    """Return the canonical host address of an IP or CIDR.
+
+    :param value: IP address in format of IP or IP/prefix_size, IPv4 or IPv6
+    :return: host address, or None if the value is not valid
+    """
+
+    host = parse_host(value)
+    return None if host is None else format_host(*host)
+
+
+def normalize_hosts(values):
+    """Validate and normalize a batch of IPs and CIDRs in one pass, see normalize_host.
+
+    Plain IPv4 addresses, the bulk of most batches, are validated a chunk at a time by mapping inet_pton over the chunk,
+    which accepts only the canonical dotted decimal form, so they are kept as they are. A chunk holding anything else
+    (CIDRs, IPv6 or invalid values) is normalized value by value.
+
+    :param values: list of IPs or CIDRs
+    :return: (hosts, invalid): the host address of each value (None for an invalid value) and the (position, value) of
+    each invalid value
+    """
+
+    inet_pton_ipv4 = functools.partial(socket.inet_pton, socket.AF_INET)
+    hosts = []
+    invalid = []
+
+    for start in range(0, len(values), _NORMALIZE_CHUNK_SIZE):
+        chunk = values[start : start + _NORMALIZE_CHUNK_SIZE]
+
+        try:
+            collections.deque(map(inet_pton_ipv4, chunk), maxlen=0)
+        except (OSError, TypeError):
+            pass
+        else:
+            hosts.extend(chunk)
+            continue
+
+        for position, value in enumerate(chunk, start):
+            host = normalize_host(value) if isinstance(value, str) else None
+            if host is None:
+                invalid.append((position, value))
+            hosts.append(host)
+
+    return hosts, invalid
+
+
+class NetworkIndex:
+    """Index of IP networks that finds the entries covering an IP or CIDR.
+
+    Entries are kept in one hash table per prefix length, keyed by the network bits. A lookup probes each prefix length
+    in use at most once, so its cost grows with the prefix length of the address and not with the number of entries.
+    """
+
+    def __init__(self):
+        # {(version, prefix length): {network bits: value}}
+        self._tables = {}
+        # {version: sorted prefix lengths in use}
+        self._prefix_lengths = {}
+
+    def __len__(self):
+        return sum(len(table) for table in self._tables.values())
+
+    @staticmethod
+    def _key(network, prefix_length):
+        return int(network.network_address) >> (network.max_prefixlen - prefix_length)
+
+    def add(self, network, value):
+        """Add a network to the index, replacing the value of an identical network.
+
+        :param network: IP or CIDR (string or ipaddress network)
+        :param value: value returned by lookups for this network
+        """
+
+        network = ipaddress.ip_network(network, strict=False)
+        table = self._tables.get((network.version, network.prefixlen))
+
+        if table is None:
+            table = self._tables[network.version, network.prefixlen] = {}
+            bisect.insort(self._prefix_lengths.setdefault(network.version, []), network.prefixlen)
+
+        table[self._key(network, network.prefixlen)] = value
+
+    def remove(self, network):
+        """Remove a network from the index, if present.
+
+        :param network: IP or CIDR (string or ipaddress network)
+        """
+
+        network = ipaddress.ip_network(network, strict=False)
+        table = self._tables.get((network.version, network.prefixlen))
+
+        if table is not None:
+            table.pop(self._key(network, network.prefixlen), None)
+
+    def covering(self, network):
+        """Return the values of the indexed networks containing the given IP or CIDR, widest network first.
+
+        :param network: IP or CIDR (string or ipaddress network)
+        :return: list of values
+        """
+
+        network = ipaddress.ip_network(network, strict=False)
+        values = []
+
+        for prefix_length in self._prefix_lengths.get(network.version, []):
+            if prefix_length > network.prefixlen:
+                break
+
+            value = self._tables[network.version, prefix_length].get(self._key(network, prefix_length))
+            if value is not None:
+                values.append(value)
+
+        return values
+
+
+class PackedNetworks:
+    """Compact collection of IP networks, for lists too large to be held as one dict per entry.
+
+    Each network is stored as the integer 'network address << 8 | prefix length', in 8 bytes for IPv4. Sorting these
+    integers sorts the networks by address, then by prefix length.
+    """
+
+    # {version: (key of the packed networks, key of the prefix length counts, max prefix length)}
+    VERSIONS = {4: ("packed_ipv4", "prefix_length_counts", 32), 6: ("packed_ipv6", "ipv6_prefix_length_counts", 128)}
+
+    def __init__(self):
+        # IPv6 values don't fit in 64 bits, they are kept as Python integers
+        self._values = {4: array.array("Q"), 6: []}
+
+    def __len__(self):
+        return sum(len(values) for values in self._values.values())
+
+    def add(self, network):
+        """Add a network.
+
+        :param network: ipaddress.IPv4Network or ipaddress.IPv6Network
+        """
+
+        self._values[network.version].append(int(network.network_address) << 8 | network.prefixlen)
+
+    def to_dict(self):
+        """Return the networks and their statistics in a JSON serializable form.
+
+        :return: {"packed_ipv4"/"packed_ipv6": base64 of the networks (address and prefix length, big endian, 5 bytes
+        per IPv4 network and 17 bytes per IPv6 network) in ascending order, "prefix_length_counts"/
+        "ipv6_prefix_length_counts": {prefix length: number of networks}, "num_ipv4_addresses"/"num_ipv6_addresses":
+        number of addresses covered by the networks, counted once even if several networks cover them, the IPv6 one as a
+        string since it doesn't fit in 64 bits}
+        """
+
+        result = {}
+
+        for version, (packed_key, counts_key, max_prefix_length) in self.VERSIONS.items():
+            values = sorted(self._values[version])
+            prefix_length_counts = collections.Counter(value & 0xFF for value in values)
+
+            # The networks are sorted by their first address, so the overlapping ones are next to each other
+            num_addresses = 0
+            covered_until = 0
+            for value in values:
+                first = value >> 8
+                end = first + 2 ** (max_prefix_length - (value & 0xFF))
+                if end > covered_until:
+                    num_addresses += end - max(first, covered_until)
+                    covered_until = end
+
+            size = max_prefix_length // 8 + 1
+            result[packed_key] = base64.b64encode(b"".join(value.to_bytes(size, "big") for value in values)).decode()
+            result[counts_key] = {str(prefix_length): count for prefix_length, count in sorted(prefix_length_counts.items())}
+            result[f"num_ipv{version}_addresses"] = num_addresses if version == 4 else str(num_addresses)
+
+        return result
+
+
+class Metrics:
+    """Thread safe latency and traffic counters of the operations of an action run, keyed by operation name (e.g.
+    'GET /platform/login').
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {operation: {"durations": [...], "bytes_in": int, "bytes_out": int, "retries": int}}
+        self._operations = {}
+
+    def _operation(self, name):
+        return self._operations.setdefault(name, {"durations": [], "bytes_in": 0, "bytes_out": 0, "retries": 0})
+
+    def record(self, name, duration, bytes_in=0, bytes_out=0, retries=0):
+        """Record one call of an operation.
+
+        :param name: operation name
+        :param duration: duration of the call in seconds
+        :param bytes_in: number of bytes received
+        :param bytes_out: number of bytes sent
+        :param retries: number of times the call was retried
+        """
+
+        with self._lock:
+            operation = self._operation(name)
+            operation["durations"].append(duration)
+            operation["bytes_in"] += bytes_in
+            operation["bytes_out"] += bytes_out
+            operation["retries"] += retries
+
+    def add_bytes_in(self, name, bytes_in):
+        """Add the bytes of a streamed response, read after its call was recorded.
+
+        :param name: operation name
+        :param bytes_in: number of bytes received
+        """
+
+        with self._lock:
+            self._operation(name)["bytes_in"] += bytes_in
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Context manager recording one call of an operation, lasting as long as the with block."""
+
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - start_time)
+
+    def update(self, other):
+        """Add the calls recorded by another Metrics object.
+
+        :param other: Metrics object
+        """
+
+        with self._lock, other._lock:
+            for name, other_operation in other._operations.items():
+                operation = self._operation(name)
+                operation["durations"].extend(other_operation["durations"])
+                for key in ("bytes_in", "bytes_out", "retries"):
+                    operation[key] += other_operation[key]
+
+    @staticmethod
+    def _percentile(durations, percent):
+        # Nearest-rank percentile of sorted durations
+        return durations[max(math.ceil(percent / 100 * len(durations)) - 1, 0)]
+
+    def summary(self):
+        """Return the counters of every operation, durations in seconds.
+
+        :return: {operation: {"count", "total_time", "p50_time", "p95_time", "bytes_in", "bytes_out", "retries"}}
+        """
+
+        summary = {}
+
+        with self._lock:
+            for name, operation in sorted(self._operations.items()):
+                durations = sorted(operation["durations"])
+                summary[name] = {
+                    "count": len(durations),
+                    "total_time": round(sum(durations), 6),
+                    "p50_time": round(self._percentile(durations, 50), 6) if durations else 0,
+                    "p95_time": round(self._percentile(durations, 95), 6) if durations else 0,
+                    "bytes_in": operation["bytes_in"],
+                    "bytes_out": operation["bytes_out"],
+                    "retries": operation["retries"],
+                }
+
+        return summary
+
+
+class SharedState:
+    """JSON document kept in a file, shared by the concurrent action runs of an asset. It is read and written under an
+    exclusive lock of the file, which also serializes the threads of an action run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextlib.contextmanager
+    def open(self):
+        """Context manager locking the file and returning its document, written back when the with block exits."""
+
+        import fcntl
+
+        with open(self.path, "a+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                try:
+                    state = json.loads(state_file.read() or "{}")
+                except ValueError:
+                    state = {}
+
+                yield state
+
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+                state_file.flush()
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """Token bucket letting through 'rate' requests per second on average and bursts of up to 'rate' requests. The
+    bucket is kept in a SharedState, so the limit holds for every action run sending requests to the same appliance.
+    """
+
+    def __init__(self, shared_state, rate):
+        self._shared_state = shared_state
+        self._rate = rate
+
+    def _refill(self, state, now):
+        bucket = state.setdefault("bucket", {"tokens": self._rate, "updated_at": now})
+        # A paused bucket holds negative tokens until the pause is over
+        bucket["tokens"] = min(self._rate, bucket["tokens"] + max(now - bucket["updated_at"], 0) * self._rate)
+        bucket["updated_at"] = now
+        return bucket
+
+    def acquire(self):
+        """Wait until a request may be sent.
+
+        :return: seconds waited
+        """
+
+        waited = 0
+
+        while True:
+            with self._shared_state.open() as state:
+                bucket = self._refill(state, time.time())
+                if bucket["tokens"] >= 1:
+                    bucket["tokens"] -= 1
+                    return waited
+
+                delay = (1 - bucket["tokens"]) / self._rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Hold back every request for the given number of seconds, e.g. when the appliance asks to slow down.
+
+        :param seconds: duration of the pause
+        """
+
+        with self._shared_state.open() as state:
+            bucket = self._refill(state, time.time())
+            bucket["tokens"] = min(bucket["tokens"], -seconds * self._rate)
+
+
+class CircuitBreaker:
+    """Stops sending requests to an appliance once 'threshold' requests in a row have failed. After 'cooldown' seconds
+    a single request is let through to probe the appliance: its success closes the circuit, its failure keeps the
+    circuit open for another cooldown. The circuit is kept in a SharedState, so it is open for every action run.
+    """
+
+    def __init__(self, shared_state, threshold, cooldown):
+        self._shared_state = shared_state
+        self._threshold = threshold
+        self._cooldown = cooldown
+
+    def check(self):
+        """Check whether a request may be sent.
+
+        :return: 0 if it may, otherwise the seconds until the next probe
+        """
+
+        with self._shared_state.open() as state:
+            circuit = state.get("circuit")
+            if not circuit or circuit.get("opened_at") is None:
+                return 0
+
+            now = time.time()
+            probe_at = max(circuit["opened_at"], circuit.get("probed_at", 0)) + self._cooldown
+            if now < probe_at:
+                return probe_at - now
+
+            # Let this request probe the appliance, the others keep failing fast until it completes (or times out)
+            circuit["probed_at"] = now
+            return 0
+
+    def record(self, success):
+        """Record the outcome of a request.
+
+        :param success: False if the appliance failed to answer or answered with a server error
+        """
+
+        with self._shared_state.open() as state:
+            circuit = state.setdefault("circuit", {"failures": 0, "opened_at": None})
+            if success:
+                circuit.update({"failures": 0, "opened_at": None})
+                circuit.pop("probed_at", None)
+                return
+
+            circuit["failures"] += 1
+            if circuit["failures"] >= self._threshold:
+                circuit["opened_at"] = time.time()
@@ -0,0 +1,153 @@
+# File: import_time.py
+#
+# Copyright (c) 2017-2026 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+"""Import time benchmark of the connector module.
+
+Run from the app directory, in an environment where the SOAR SDK (phantom) and the app requirements are installed:
+
+    python benchmarks/import_time.py [--runs N] [--max-ratio R] [--details]
+
+Every run imports the SOAR SDK modules and then arboraps_connector in a fresh interpreter, like each action run does.
+Wall-clock import times vary a lot between machines and runs, so the import time of the connector is reported relative
+to the import time of the SDK measured in the same interpreter, which every connector pays for. The benchmark fails
+(exit code 1) if one of the modules that the connector imports lazily got imported, and if the median ratio exceeds
+--max-ratio, which defaults to the startup budget DEFAULT_MAX_RATIO.
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only needed by some code paths, the connector must not import them when it is imported
+LAZY_MODULES = (
+    "bs4",
+    "requests",
+    "urllib3",
+    "encryption_helper",
+    "phantom.rules",
+    "phantom.vault",
+    "concurrent.futures",
+    "gzip",
+    "csv",
+)
+
+# Startup budget: median import time of the connector relative to the SDK. The median ratio measured over 20 runs was
+# about 16.6, the budget leaves some headroom for the noise between runs
+DEFAULT_MAX_RATIO = 20.0
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start_time = time.perf_counter()
+import phantom.app, phantom.action_result, phantom.base_connector
+sdk_import_time = time.perf_counter() - start_time
+start_time = time.perf_counter()
+import arboraps_connector
+import_time = time.perf_counter() - start_time
+print(json.dumps({{
+    "import_time": import_time,
+    "sdk_import_time": sdk_import_time,
+    "lazy_modules": [name for name in {lazy_modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def _import_connector(details=False):
+    """Import the connector in a fresh interpreter and return its measurements."""
+
+    command = [sys.executable, "-c", IMPORT_SCRIPT.format(lazy_modules=LAZY_MODULES)]
+    if details:
+        command[1:1] = ["-X", "importtime"]
+
+    process = subprocess.run(command, cwd=APP_DIR, check=True, capture_output=True, text=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["importtime"] = process.stderr
+
+    return result
+
+
+def _print_details(importtime_output, count=15):
+    """Print the modules imported by the connector with the largest cumulative import time, from the output of
+    python -X importtime. A module is listed after the modules it imports, one level of indentation deeper.
+    """
+
+    modules = []
+    for line in importtime_output.splitlines():
+        _, _, fields = line.partition("import time:")
+        self_time, _, fields = fields.partition("|")
+        cumulative_time, _, name = fields.partition("|")
+        if cumulative_time.strip().isdigit():
+            modules.append((int(cumulative_time), int(self_time), name.rstrip()))
+
+    # Keep the connector and the modules it imported, listed right before it
+    connector_modules = []
+    for cumulative_time, self_time, name in reversed(modules):
+        if connector_modules and len(name) - len(name.lstrip()) <= len(connector_modules[0][2]) - len(connector_modules[0][2].lstrip()):
+            break
+        if connector_modules or name.strip() == "arboraps_connector":
+            connector_modules.append((cumulative_time, self_time, name))
+
+    print(f"\n{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+    for cumulative_time, self_time, name in sorted(connector_modules, reverse=True)[:count]:
+        print(f"{cumulative_time / 1000:>16.1f} {self_time / 1000:>10.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the connector module")
+    parser.add_argument("--runs", type=int, default=20, help="number of fresh interpreters to import the connector in")
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=DEFAULT_MAX_RATIO,
+        help=f"maximum median import time of the connector relative to the SDK (default {DEFAULT_MAX_RATIO})",
+    )
+    parser.add_argument("--details", action="store_true", help="print the slowest modules imported by the connector")
+    args = parser.parse_args()
+
+    results = [_import_connector() for _ in range(args.runs)]
+    import_times = sorted(result["import_time"] * 1000 for result in results)
+    sdk_import_times = sorted(result["sdk_import_time"] * 1000 for result in results)
+    ratio = statistics.median(result["import_time"] / result["sdk_import_time"] for result in results)
+    lazy_modules = sorted({name for result in results for name in result["lazy_modules"]})
+
+    for name, times in (("SOAR SDK", sdk_import_times), ("arboraps_connector", import_times)):
+        print(f"import {name}: median {statistics.median(times):.1f} ms, min {times[0]:.1f} ms, max {times[-1]:.1f} ms")
+    print(f"arboraps_connector / SOAR SDK: median ratio {ratio:.2f}")
+
+    if args.details:
+        _print_details(_import_connector(details=True)["importtime"])
+
+    failed = False
+
+    if ratio > args.max_ratio:
+        print(f"FAILED: the median import time of the connector is {ratio:.2f} times the SDK one, above {args.max_ratio:.2f}")
+        failed = True
+
+    if lazy_modules:
+        print(f"FAILED: modules meant to be imported lazily were imported: {', '.join(lazy_modules)}")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# File: mock_aps_server.py
+#
+# Copyright (c) 2017-2026 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# Standard library imports
+import collections
+import email.utils
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+LIST_PATH = "/api/aps/v1/otf/"
+LIST_NAMES = ("blacklisted-hosts", "whitelisted-hosts")
+LOGIN_PAGE = "<html><body><form>\n<p>Username</p>\n<p>Password</p>\n<button>Log In</button>\n</form></body></html>"
+
+
+class MockApsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the login, logout and outbound list endpoints of the APS used by the connector. If the server is conditional,
+    the lists are served with an ETag and a Last-Modified header and the conditional requests of an unchanged list get a 304
+    response.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle's algorithm delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        return
+
+    def _send(self, status_code, body="", content_type=None, headers=()):
+        body = body.encode() if isinstance(body, str) else body
+        self.send_response(status_code)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_session_id(self):
+        for cookie in self.headers.get("Cookie", "").split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name == "sessionid":
+                return value
+
+        return None
+
+    def _handle(self, method):
+        aps = self.server.aps
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        content_length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(content_length).decode() if content_length else ""
+
+        if aps.latency:
+            time.sleep(aps.latency)
+
+        if url.path == "/platform/login":
+            aps.count(method, url.path)
+            credentials = parse_qs(body)
+            if method == "POST" and credentials.get("username") == [aps.username] and credentials.get("password") == [aps.password]:
+                session_id = uuid.uuid4().hex
+                with aps.lock:
+                    aps.sessions.add(session_id)
+                return self._send(200, "<html><body>Welcome</body></html>", "text/html", [("Set-Cookie", f"sessionid={session_id}; Path=/")])
+            return self._send(200, LOGIN_PAGE, "text/html")
+
+        if url.path == "/platform/logout":
+            aps.count(method, url.path)
+            with aps.lock:
+                aps.sessions.discard(self._get_session_id())
+            return self._send(200, "<html><body>Logged out</body></html>", "text/html")
+
+        # /api/aps/v1/otf/<list name>/ or /api/aps/v1/otf/<list name>/<IP or CIDR>/
+        list_name, _, host_address = url.path[len(LIST_PATH) :].strip("/").partition("/")
+        if not url.path.startswith(LIST_PATH) or list_name not in LIST_NAMES:
+            aps.count(method, url.path)
+            return self._send(404, "<html><body>Not Found</body></html>", "text/html")
+
+        aps.count(method, f"{LIST_PATH}{list_name}/{'{ip}/' if host_address else ''}")
+
+        # Like the appliance, send requests without a valid session back to the login form
+        if self._get_session_id() not in aps.sessions:
+            return self._send(302, headers=[("Location", "/platform/login")])
+
+        hosts = aps.lists[list_name]
+
+        if method == "GET" and not host_address:
+            with aps.lock:
+                etag, last_modified = aps.get_validators(list_name)
+                if aps.conditional and self._is_not_modified(etag, last_modified):
+                    aps.num_not_modified += 1
+                    return self._send(304, headers=[("ETag", etag)])
+                body = json.dumps({list_name: [{"hostAddress": address, "updateTime": update_time} for address, update_time in hosts.items()]})
+            headers = [("ETag", etag), ("Last-Modified", email.utils.formatdate(last_modified, usegmt=True))] if aps.conditional else []
+            return self._send(200, body, "application/json", headers)
+
+        if method == "GET":
+            host_address = unquote(host_address)
+            with aps.lock:
+                update_time = hosts.get(host_address)
+            if update_time is None:
+                return self._send(200, "{}", "application/json")
+            return self._send(200, json.dumps({"hostAddress": host_address, "updateTime": update_time}), "application/json")
+
+        host_address = query.get("hostAddress", [""])[0]
+        if method == "POST":
+            with aps.lock:
+                update_time = hosts[host_address] = int(time.time())
+                aps.list_changed(list_name)
+            return self._send(201, json.dumps({"hostAddress": host_address, "updateTime": update_time}), "application/json")
+
+        with aps.lock:
+            if hosts.pop(host_address, None) is not None:
+                aps.list_changed(list_name)
+        return self._send(204)
+
+    def _is_not_modified(self, etag, last_modified):
+        # Like HTTP caches, If-Modified-Since is only considered without If-None-Match
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in (value.strip() for value in if_none_match.split(","))
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+
+        try:
+            return last_modified <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class MockApsServer:
+    """Local stand-in for an APS appliance, running in a background thread.
+
+    :param latency: seconds added to every response
+    :param username: accepted username
+    :param password: accepted password
+    :param conditional: serve the lists with an ETag and a Last-Modified header and answer the conditional requests of an
+    unchanged list with a 304 response
+    """
+
+    def __init__(self, latency=0, username="admin", password="password", conditional=False):  # pragma: allowlist secret
+        self.latency = latency
+        self.username = username
+        self.password = password
+        self.conditional = conditional
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.lists = {list_name: {} for list_name in LIST_NAMES}
+        self.counts = collections.Counter()
+        self.num_not_modified = 0
+        # The ETags of a server must not match the ones of another server, e.g. of a previous benchmark run
+        self._etag_prefix = uuid.uuid4().hex[:8]
+        self._versions = {list_name: (0, int(time.time())) for list_name in LIST_NAMES}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self._server.server_address[0]}:{self._server.server_address[1]}"
+
+    def count(self, method, path):
+        with self.lock:
+            self.counts[f"{method} {path}"] += 1
+
+    def list_changed(self, list_name):
+        """Change the ETag and the Last-Modified time of a list, called with the lock held."""
+
+        version, _ = self._versions[list_name]
+        self._versions[list_name] = (version + 1, int(time.time()))
+
+    def get_validators(self, list_name):
+        """Return the ETag and the Last-Modified timestamp of a list, called with the lock held."""
+
+        version, last_modified = self._versions[list_name]
+        return f'"{self._etag_prefix}-{version}"', last_modified
+
+    def set_list(self, list_name, host_addresses):
+        """Replace the entries of a list.
+
+        :param list_name: blacklisted-hosts/whitelisted-hosts
+        :param host_addresses: iterable of IPs and CIDRs
+        """
+
+        update_time = int(time.time())
+        with self.lock:
+            self.lists[list_name] = dict.fromkeys(host_addresses, update_time)
+            self.list_changed(list_name)
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+            self.num_not_modified = 0
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), MockApsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.aps = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,322 @@
+# File: run_benchmarks.py
+#
+# Copyright (c) 2017-2026 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+"""Offline benchmarks of the connector against a local mock APS server.
+
+Run from the app directory, in an environment where the SOAR SDK (phantom) and the app requirements are installed:
+
+    python benchmarks/run_benchmarks.py [--latency MS] [--list-size N] [--params N] [--bulk-size N] [--sync-size N]
+                                        [--workers N] [--scenario NAME ...] [--output FILE]
+                                        [--baseline FILE] [--tolerance FRACTION]
+
+Each scenario drives ArborApsConnector._handle_action in a fresh Python process, so that its peak memory is measured on
+its own, and reports the wall time of the action, the requests received by the mock server, the requests it answered
+with a 304 response and the peak memory. The mock server supports conditional requests, the *_unchanged scenarios run
+their action once before the measured run so that the measured run finds the list unchanged.
+
+Given the --output file of a previous run as --baseline, the benchmark fails (exit code 1) if a scenario got slower or
+used more memory than its baseline by more than the tolerance, sent more requests, got fewer 304 responses or had more
+failed results.
+"""
+
+# Standard library imports
+import argparse
+import ipaddress
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARKS_DIR)
+# First IP of the IPv6 scenarios, from the documentation prefix
+IPV6_FIRST_IP = "2001:db8::"
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from mock_aps_server import MockApsServer
+
+
+def _ips(count, first="10.0.0.0"):
+    """Return 'count' consecutive IPs starting at 'first'."""
+
+    start = int(ipaddress.ip_address(first))
+    return [str(ipaddress.ip_address(start + offset)) for offset in range(count)]
+
+
+def _block_ip_single(args, server):
+    return "block ip", "block_ip", [{"ip": "10.0.0.1"}]
+
+
+def _block_ip_many(args, server):
+    return "block ip", "block_ip", [{"ip": ip} for ip in _ips(args.params)]
+
+
+def _list_ips_large(args, server):
+    server.set_list("blacklisted-hosts", _ips(args.list_size))
+    return "list ips", "list_ips", [{"list": "blocklist"}]
+
+
+def _block_ips_bulk(args, server):
+    return "block ips", "block_ips", [{"ips": ",".join(_ips(args.bulk_size))}]
+
+
+def _sync_blocklist(args, server):
+    # A tenth of the list is replaced by new IPs
+    changed = max(args.sync_size // 10, 1)
+    server.set_list("blacklisted-hosts", _ips(args.sync_size))
+    desired = _ips(args.sync_size)[changed:] + _ips(changed, first="172.16.0.0")
+    return "sync blocklist", "sync_blocklist", [{"ips": ",".join(desired)}]
+
+
+def _list_ips_large_ipv6(args, server):
+    server.set_list("blacklisted-hosts", _ips(args.list_size, first=IPV6_FIRST_IP))
+    return "list ips", "list_ips", [{"list": "blocklist"}]
+
+
+def _block_ips_bulk_ipv6(args, server):
+    return "block ips", "block_ips", [{"ips": ",".join(_ips(args.bulk_size, first=IPV6_FIRST_IP))}]
+
+
+def _sync_blocklist_ipv6(args, server):
+    # A tenth of the list is replaced by new IPs, given in their expanded form to exercise the normalization
+    changed = max(args.sync_size // 10, 1)
+    server.set_list("blacklisted-hosts", _ips(args.sync_size, first=IPV6_FIRST_IP))
+    desired = _ips(args.sync_size, first=IPV6_FIRST_IP)[changed:]
+    desired += [ipaddress.ip_address(ip).exploded for ip in _ips(changed, first="2001:db8:ffff::")]
+    return "sync blocklist", "sync_blocklist", [{"ips": ",".join(desired)}]
+
+
+def _sync_blocklist_unchanged(args, server):
+    server.set_list("blacklisted-hosts", _ips(args.sync_size))
+    return "sync blocklist", "sync_blocklist", [{"ips": ",".join(_ips(args.sync_size))}]
+
+
+def _on_poll_unchanged(args, server):
+    server.set_list("blacklisted-hosts", _ips(args.list_size))
+    server.set_list("whitelisted-hosts", _ips(args.list_size // 10, first="172.16.0.0"))
+    return "on poll", "on_poll", [{}]
+
+
+# {scenario name: function(args, server) preparing the mock server and returning (action, identifier, params)}
+SCENARIOS = {
+    "block_ip_single": _block_ip_single,
+    "block_ip_many": _block_ip_many,
+    "list_ips_large": _list_ips_large,
+    "block_ips_bulk": _block_ips_bulk,
+    "sync_blocklist": _sync_blocklist,
+    "list_ips_large_ipv6": _list_ips_large_ipv6,
+    "block_ips_bulk_ipv6": _block_ips_bulk_ipv6,
+    "sync_blocklist_ipv6": _sync_blocklist_ipv6,
+    "sync_blocklist_unchanged": _sync_blocklist_unchanged,
+    "on_poll_unchanged": _on_poll_unchanged,
+}
+
+# {scenario name: asset configuration added to the one of every scenario}
+SCENARIO_CONFIGS = {
+    "sync_blocklist_unchanged": {"list_cache_ttl": 3600},
+    "on_poll_unchanged": {"ingest_list_changes": True},
+}
+
+# Scenarios whose action is run once before the measured run, which then finds the lists unchanged since that run
+WARM_UP_SCENARIOS = ("sync_blocklist_unchanged", "on_poll_unchanged")
+
+# Measurements compared to the baseline: {measurement: True if it may exceed the baseline by the tolerance}
+BASELINE_MAXIMUMS = {"wall_time": True, "peak_memory": True, "num_requests": False, "num_failed": False}
+BASELINE_MINIMUMS = ("num_not_modified",)
+
+
+def _run_action(in_json_file, result_file):
+    """Run an action in this process and write its measurements to the result file."""
+
+    sys.path.insert(0, APP_DIR)
+
+    from arboraps_connector import ArborApsConnector
+
+    with open(in_json_file) as f:
+        in_json = json.load(f)
+
+    connector = ArborApsConnector()
+
+    start_time = time.perf_counter()
+    results = json.loads(connector._handle_action(json.dumps(in_json), None))
+    wall_time = time.perf_counter() - start_time
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    results = results if isinstance(results, list) else [results]
+
+    with open(result_file, "w") as f:
+        json.dump(
+            {
+                "wall_time": wall_time,
+                "peak_memory": peak_memory,
+                "num_failed": sum(1 for result in results if result.get("status") != "success"),
+            },
+            f,
+        )
+
+
+def _run_in_process(in_json):
+    """Run an action in a fresh Python process and return its measurements."""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_json_file = os.path.join(tmp_dir, "in.json")
+        result_file = os.path.join(tmp_dir, "result.json")
+
+        with open(in_json_file, "w") as f:
+            json.dump(in_json, f)
+
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-action", in_json_file, result_file],
+            cwd=APP_DIR,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def run_scenario(name, args, server):
+    """Run a scenario against the mock server and return its measurements."""
+
+    server.set_list("blacklisted-hosts", [])
+    server.set_list("whitelisted-hosts", [])
+    action, identifier, params = SCENARIOS[name](args, server)
+
+    in_json = {
+        "action": action,
+        "identifier": identifier,
+        "asset_id": f"benchmark_{name}",
+        "config": {
+            "server_url": server.url,
+            "username": server.username,
+            "password": server.password,
+            "verify_server_cert": False,
+            "max_concurrent_requests": args.workers,
+            **SCENARIO_CONFIGS.get(name, {}),
+        },
+        "parameters": params,
+    }
+
+    if name in WARM_UP_SCENARIOS:
+        _run_in_process(in_json)
+
+    server.reset_counts()
+    result = _run_in_process(in_json)
+
+    result.update(
+        {
+            "scenario": name,
+            "num_params": len(params),
+            "num_requests": sum(server.counts.values()),
+            "num_not_modified": server.num_not_modified,
+            "requests": dict(server.counts),
+        }
+    )
+
+    return result
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Compare the results of the scenarios to the ones of a previous run.
+
+    :param results: list of results of run_scenario
+    :param baseline: list of results of run_scenario of the previous run
+    :param tolerance: fraction by which the wall time and the peak memory may exceed the baseline
+    :return: list of regression messages
+    """
+
+    baseline = {result["scenario"]: result for result in baseline}
+    regressions = []
+
+    for result in results:
+        name = result["scenario"]
+        if name not in baseline:
+            continue
+
+        for measurement, tolerated in BASELINE_MAXIMUMS.items():
+            limit = baseline[name].get(measurement, 0) * (1 + tolerance if tolerated else 1)
+            if result[measurement] > limit:
+                regressions.append(f"{name}: {measurement} {result[measurement]:g} above {limit:g}")
+
+        for measurement in BASELINE_MINIMUMS:
+            limit = baseline[name].get(measurement, 0)
+            if result[measurement] < limit:
+                regressions.append(f"{name}: {measurement} {result[measurement]:g} below {limit:g}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the connector against a local mock APS server")
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds added to every response of the mock server")
+    parser.add_argument("--list-size", type=int, default=100000, help="entries of the list of list_ips_large")
+    parser.add_argument("--params", type=int, default=1000, help="params of block_ip_many")
+    parser.add_argument("--bulk-size", type=int, default=1000, help="IPs of block_ips_bulk")
+    parser.add_argument("--sync-size", type=int, default=10000, help="entries of the list of sync_blocklist")
+    parser.add_argument("--workers", type=int, default=5, help="max_concurrent_requests of the asset")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="scenario to run, all of them by default")
+    parser.add_argument("--output", help="JSON file to write the results to, e.g. to compare them between CI runs")
+    parser.add_argument("--baseline", help="JSON file written by --output of a previous run to compare the results to")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="fraction by which the wall time and the peak memory may exceed the baseline"
+    )
+    parser.add_argument("--run-action", nargs=2, metavar=("IN_JSON", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_action:
+        _run_action(*args.run_action)
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    server = MockApsServer(latency=args.latency / 1000, conditional=True).start()
+    results = []
+
+    try:
+        print(f"{'scenario':<24} {'params':>8} {'wall time (s)':>14} {'requests':>10} {'304':>6} {'peak memory (MB)':>17} {'failed':>7}")
+        for name in args.scenario or SCENARIOS:
+            result = run_scenario(name, args, server)
+            results.append(result)
+            print(
+                f"{name:<24} {result['num_params']:>8} {result['wall_time']:>14.3f} {result['num_requests']:>10} "
+                f"{result['num_not_modified']:>6} {result['peak_memory'] / 2**20:>17.1f} {result['num_failed']:>7}"
+            )
+    finally:
+        server.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"FAILED: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# File: validate_ips.py
+#
+# Copyright (c) 2017-2026 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+"""Throughput benchmark of the batch validation and normalization of IPs used by the bulk and sync actions.
+
+Run from the app directory:
+
+    python benchmarks/validate_ips.py [--count N] [--runs N] [--min-rate N]
+
+Each batch is normalized with arboraps_utils.normalize_hosts and with the ipaddress module for comparison. The benchmark
+fails (exit code 1) if the plain IPv4 batch, the usual input of the bulk actions, is normalized more slowly than the
+minimum rate.
+"""
+
+# Standard library imports
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_DIR)
+
+from arboraps_utils import normalize_hosts
+
+
+def _ipv4(rng):
+    return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+
+
+def _ipv6(rng):
+    return str(ipaddress.IPv6Address(rng.getrandbits(128)))
+
+
+def _mixed(rng):
+    # CIDRs with host bits set, IPv6 and a few invalid entries among the IPv4 addresses
+    draw = rng.random()
+    if draw < 0.1:
+        return f"{_ipv4(rng)}/{rng.randint(8, 32)}"
+    if draw < 0.2:
+        return _ipv6(rng)
+    if draw < 0.21:
+        return "not-an-ip"
+    return _ipv4(rng)
+
+
+# {batch name: function(random generator) returning an entry of the batch}
+BATCHES = {"ipv4": _ipv4, "ipv6": _ipv6, "mixed": _mixed}
+
+
+def _normalize_with_ipaddress(values):
+    hosts = []
+    for value in values:
+        try:
+            hosts.append(str(ipaddress.ip_network(value, strict=False)))
+        except ValueError:
+            hosts.append(None)
+    return hosts
+
+
+def _measure(function, values, runs):
+    """Return the best rate, in entries per second, of the given number of runs."""
+
+    best_time = None
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        function(values)
+        elapsed = time.perf_counter() - start_time
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    return len(values) / best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of the batch IP validation and normalization")
+    parser.add_argument("--count", type=int, default=1000000, help="entries of each batch")
+    parser.add_argument("--runs", type=int, default=3, help="runs of each measurement, the best one is reported")
+    parser.add_argument("--min-rate", type=float, default=1000000, help="minimum rate of the ipv4 batch in entries per second")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rates = {}
+
+    print(f"{'batch':<8} {'entries':>9} {'invalid':>8} {'normalize_hosts (/s)':>21} {'ipaddress (/s)':>15}")
+    for name, make_value in BATCHES.items():
+        values = [make_value(rng) for _ in range(args.count)]
+        _, invalid = normalize_hosts(values)
+        rates[name] = _measure(normalize_hosts, values, args.runs)
+        # ipaddress is much slower, a slice of the batch is enough to measure it
+        reference_rate = _measure(_normalize_with_ipaddress, values[: max(args.count // 10, 1)], 1)
+        print(f"{name:<8} {len(values):>9} {len(invalid):>8} {rates[name]:>21,.0f} {reference_rate:>15,.0f}")
+
+    print(f"minimum rate of the ipv4 batch: {args.min_rate:,.0f} /s")
+
+    if rates["ipv4"] < args.min_rate:
+        print(f"FAILED: the ipv4 batch is normalized at {rates['ipv4']:,.0f} entries per second")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()